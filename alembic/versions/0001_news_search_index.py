@@ -0,0 +1,44 @@
+"""news full-text search index
+
+Revision ID: 0001_news_search_index
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+The repository keeps no baseline revision, so this migration starts its own
+"novanews" branch and is a no-op on databases where the news table has not
+been created yet (autogenerate picks the index up from the models there).
+The index is built concurrently, so writes to a populated table are not blocked.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_news_search_index'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = ('novanews',)
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(content, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("news"):
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_news_search_vector "
+            f"ON news USING gin (({SEARCH_VECTOR}))"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_news_search_vector")
@@ -0,0 +1,51 @@
+"""news comments_count counter
+
+Revision ID: 0002_news_comments_count
+Revises: 0001_news_search_index
+Create Date: 2026-10-18 12:30:00.000000
+
+Adds the denormalized comments counter and backfills it in id batches,
+so each batch only locks a slice of the news table.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_news_comments_count'
+down_revision: Union[str, None] = '0001_news_search_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("news"):
+        return
+    if "comments_count" in {column["name"] for column in inspector.get_columns("news")}:
+        return
+
+    op.add_column("news", sa.Column("comments_count", sa.Integer(), server_default="0", nullable=False))
+
+    max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM news")).scalar()
+    with op.get_context().autocommit_block():
+        for start in range(0, max_id + 1, BATCH_SIZE):
+            bind.execute(
+                sa.text(
+                    "UPDATE news SET comments_count = counts.total "
+                    "FROM (SELECT news_id, count(*) AS total FROM comment "
+                    "WHERE news_id >= :start AND news_id < :end GROUP BY news_id) AS counts "
+                    "WHERE news.id = counts.news_id"
+                ),
+                {"start": start, "end": start + BATCH_SIZE},
+            )
+
+
+def downgrade() -> None:
+    op.drop_column("news", "comments_count")
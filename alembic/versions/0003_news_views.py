@@ -0,0 +1,34 @@
+"""news views counter
+
+Revision ID: 0003_news_views
+Revises: 0002_news_comments_count
+Create Date: 2026-10-18 18:00:00.000000
+
+A constant server default makes the new column a catalog-only change,
+the table is not rewritten.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_news_views'
+down_revision: Union[str, None] = '0002_news_comments_count'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("news"):
+        return
+    if "views" in {column["name"] for column in inspector.get_columns("news")}:
+        return
+
+    op.add_column("news", sa.Column("views", sa.BigInteger(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("news", "views")
@@ -0,0 +1,41 @@
+"""media_blob table
+
+Revision ID: 0004_media_blob
+Revises: 0003_news_views
+Create Date: 2026-10-19 10:00:00.000000
+
+Reference counts of content-addressed media blobs (MEDIA_STORAGE=hash).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_media_blob'
+down_revision: Union[str, None] = '0003_news_views'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("media_blob"):
+        return
+
+    op.create_table(
+        "media_blob",
+        sa.Column("path", sa.String(length=255), nullable=False),
+        sa.Column("digest", sa.String(length=64), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False),
+        sa.Column("updated", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("path"),
+    )
+    op.create_index("ix_media_blob_digest", "media_blob", ["digest"])
+    op.create_index("ix_media_blob_updated", "media_blob", ["updated"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_blob_updated", table_name="media_blob")
+    op.drop_index("ix_media_blob_digest", table_name="media_blob")
+    op.drop_table("media_blob")
@@ -0,0 +1,41 @@
+"""keyset pagination indexes
+
+Revision ID: 0005_keyset_indexes
+Revises: 0004_media_blob
+Create Date: 2026-10-19 11:00:00.000000
+
+Composite indexes behind the (created, id) keyset pages of news and comments.
+They are built concurrently, so writes to populated tables are not blocked;
+tables that do not exist yet get them from the models.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_keyset_indexes'
+down_revision: Union[str, None] = '0004_media_blob'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = {
+    "ix_news_created_id": ("news", "created, id"),
+    "ix_comment_news_id_created_id": ("comment", "news_id, created, id"),
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    with op.get_context().autocommit_block():
+        for name, (table, columns) in INDEXES.items():
+            if inspector.has_table(table):
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,3 @@
+"""
+HTTP benchmarks for the API
+"""
@@ -0,0 +1,198 @@
+"""
+Soak test of the realtime endpoint: N concurrent WebSocket subscribers
+on one server process while events are published through Redis.
+
+Starts `uvicorn main:app` with a single worker unless --url is given:
+
+    python -m benchmarks.realtime_soak --subscribers 10000 --events 200 --rate 20
+    python -m benchmarks.realtime_soak --subscribers 10000 --slow-fraction 0.01 --payload-size 65536
+
+Slow clients stop reading, so once the socket buffers are full their server-side
+queue overflows and they should be disconnected with 1013 (lagged_disconnects)
+
+The clients share one process, so run it on a different core (or host)
+than the server when the latency numbers matter
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from redis import asyncio as aioredis
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from src.environs import REDIS_URL
+from src.realtime.broker import CHANNEL_PREFIX
+
+
+class Stats():
+
+    def __init__(self) -> None:
+        self.connected = 0
+        self.connect_errors = 0
+        self.received = 0
+        self.lagged = 0
+        self.closed = 0
+        self.latencies: list[float] = []
+
+
+def raise_file_limit() -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def rss_megabytes(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values: list[float], percent: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))]
+
+
+async def subscriber(url: str, stats: Stats, ready: asyncio.Semaphore, slow: bool, stop: asyncio.Event) -> None:
+    async with ready:
+        try:
+            websocket = await connect(url, open_timeout=30, max_queue=1 if slow else 16)
+        except (OSError, asyncio.TimeoutError, ConnectionClosed):
+            stats.connect_errors += 1
+            return
+    stats.connected += 1
+
+    try:
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            payload = json.loads(message)
+            stats.received += 1
+            stats.latencies.append(time.time() - payload["data"]["sent"])
+            if slow:
+                await asyncio.sleep(5)
+    except ConnectionClosed as exc:
+        stats.closed += 1
+        if exc.rcvd is not None and exc.rcvd.code == 1013:
+            stats.lagged += 1
+    finally:
+        await websocket.close()
+
+
+async def publisher(events: int, rate: float, payload_size: int) -> None:
+    redis = aioredis.from_url(REDIS_URL)
+    padding = "x" * payload_size
+    try:
+        for index in range(events):
+            message = json.dumps({"event": "benchmark", "data": {"index": index, "sent": time.time(), "padding": padding}})
+            await redis.publish(f"{CHANNEL_PREFIX}news", message)
+            await asyncio.sleep(1 / rate)
+    finally:
+        await redis.aclose()
+
+
+async def soak(args: argparse.Namespace, server_pid: int | None) -> dict:
+    stats = Stats()
+    stop = asyncio.Event()
+    ready = asyncio.Semaphore(args.connect_concurrency)
+    url = f"{args.url}?channel=news"
+    slow_count = int(args.subscribers * args.slow_fraction)
+
+    started = time.perf_counter()
+    clients = [
+        asyncio.create_task(subscriber(url, stats, ready, index < slow_count, stop))
+        for index in range(args.subscribers)
+    ]
+    while stats.connected + stats.connect_errors < args.subscribers:
+        await asyncio.sleep(0.1)
+    connect_seconds = time.perf_counter() - started
+    rss_connected = rss_megabytes(server_pid) if server_pid else None
+
+    await publisher(args.events, args.rate, args.payload_size)
+    await asyncio.sleep(args.drain)
+    stop.set()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    fast = stats.connected - slow_count
+    expected = fast * args.events
+    return {
+        "subscribers": args.subscribers,
+        "connected": stats.connected,
+        "connect_errors": stats.connect_errors,
+        "connect_s": round(connect_seconds, 2),
+        "events": args.events,
+        "received": stats.received,
+        "delivery_ratio_fast_clients": round(min(stats.received, expected) / expected, 4) if expected else None,
+        "lagged_disconnects": stats.lagged,
+        "slow_clients": slow_count,
+        "latency_ms": {
+            "p50": round((percentile(stats.latencies, 50) or 0) * 1000, 2),
+            "p95": round((percentile(stats.latencies, 95) or 0) * 1000, 2),
+            "p99": round((percentile(stats.latencies, 99) or 0) * 1000, 2),
+            "mean": round(statistics.fmean(stats.latencies) * 1000, 2) if stats.latencies else None,
+        },
+        "server_rss_mb": rss_connected,
+    }
+
+
+def start_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", "1",
+         "--log-level", "warning", "--backlog", "8192"],
+        env=dict(os.environ),
+    )
+    time.sleep(3)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.realtime_soak")
+    parser.add_argument("--url", help="ws:// URL of a running /ws/events endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10, help="published events per second")
+    parser.add_argument("--payload-size", type=int, default=512)
+    parser.add_argument("--slow-fraction", type=float, default=0, help="share of clients that barely read")
+    parser.add_argument("--connect-concurrency", type=int, default=500)
+    parser.add_argument("--drain", type=float, default=5, help="seconds to wait for deliveries after publishing")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args()
+
+    raise_file_limit()
+    server = None
+    if args.url is None:
+        server = start_server(args.port)
+        args.url = f"ws://127.0.0.1:{args.port}/ws/events"
+
+    try:
+        result = asyncio.run(soak(args, server.pid if server else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
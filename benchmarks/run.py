@@ -0,0 +1,215 @@
+"""
+Scripted mixed-workload benchmark against main:app.
+
+Runs in-process through httpx.ASGITransport by default, or against a
+running server with --base-url. Results are written as JSON:
+
+    python -m benchmarks.run --duration 60 --concurrency 32 --output results.json
+    python -m benchmarks.run --duration 60 --compare baseline.json --tolerance 10
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+import httpx
+from sqlalchemy import text
+
+
+@dataclass
+class Scenario:
+    """
+    One endpoint of the workload with its share of the traffic
+    """
+    name: str
+    weight: int
+    request: Callable[[httpx.AsyncClient, "Dataset"], Awaitable[httpx.Response]]
+
+
+@dataclass
+class Dataset:
+    """
+    Ids sampled from the seeded database to build realistic requests
+    """
+    news_ids: list[int]
+    category_ids: list[int]
+    words: list[str]
+
+    def news_id(self) -> int:
+        return random.choice(self.news_ids)
+
+
+async def walk_news(client: httpx.AsyncClient, dataset: Dataset) -> httpx.Response:
+    # infinite scroll: a few pages deep through the cursor
+    response = await client.get("/news", params={"limit": 20})
+    for _ in range(random.randint(0, 3)):
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        response = await client.get("/news", params={"limit": 20, "cursor": cursor})
+    return response
+
+
+SCENARIOS = [
+    Scenario("GET /news", 30, lambda client, dataset: client.get("/news", params={"limit": 20})),
+    Scenario("GET /news (scroll)", 10, walk_news),
+    Scenario("GET /news/{news_id}", 25, lambda client, dataset: client.get(f"/news/{dataset.news_id()}")),
+    Scenario("GET /categories", 5, lambda client, dataset: client.get("/categories")),
+    Scenario(
+        "GET /comments/{news_id}",
+        15,
+        lambda client, dataset: client.get(f"/comments/{dataset.news_id()}", params={"limit": 20}),
+    ),
+    Scenario(
+        "GET /comments/batch",
+        10,
+        lambda client, dataset: client.get(
+            "/comments/batch",
+            params={"news_ids": random.sample(dataset.news_ids, k=min(30, len(dataset.news_ids)))},
+        ),
+    ),
+    Scenario(
+        "GET /news/search",
+        5,
+        lambda client, dataset: client.get("/news/search", params={"q": random.choice(dataset.words)}),
+    ),
+]
+
+
+async def load_dataset(sample_size: int = 10000) -> Dataset:
+    from src.database import engine
+
+    async with engine.connect() as connection:
+        news_ids = (await connection.execute(
+            text("SELECT id FROM news TABLESAMPLE SYSTEM (1) LIMIT :limit"), {"limit": sample_size}
+        )).scalars().all()
+        if not news_ids:
+            news_ids = (await connection.execute(text("SELECT id FROM news LIMIT :limit"), {"limit": sample_size})).scalars().all()
+        category_ids = (await connection.execute(text("SELECT id FROM category"))).scalars().all()
+    await engine.dispose()
+
+    if not news_ids:
+        sys.exit("The database is empty, run python -m benchmarks.seed first")
+    return Dataset(news_ids=list(news_ids), category_ids=list(category_ids), words=["benchmark", "lorem", "ipsum dolor", "amet"])
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(client: httpx.AsyncClient, dataset: Dataset, duration: float, concurrency: int, warmup: float) -> dict:
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    weights = [scenario.weight for scenario in SCENARIOS]
+    deadline = time.perf_counter() + warmup + duration
+    measure_from = time.perf_counter() + warmup
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            scenario = random.choices(SCENARIOS, weights=weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await scenario.request(client, dataset)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if started < measure_from:
+                continue
+            latencies[scenario.name].append(time.perf_counter() - started)
+            if failed:
+                errors[scenario.name] += 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    endpoints = {}
+    for name, values in sorted(latencies.items()):
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "throughput_rps": round(len(values) / duration, 2),
+            "mean_ms": round(statistics.fmean(values) * 1000, 3),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "duration_s": duration,
+        "concurrency": concurrency,
+        "python": platform.python_version(),
+        "total_requests": total,
+        "throughput_rps": round(total / duration, 2),
+        "endpoints": endpoints,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Endpoints whose p95/p99 grew or throughput dropped by more than tolerance percent
+    """
+    regressions = []
+    for name, current in result["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance / 100):
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {current[metric]}")
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance / 100):
+            regressions.append(f"{name}: throughput_rps {previous['throughput_rps']} -> {current['throughput_rps']}")
+    return regressions
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    dataset = await load_dataset()
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30)
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=30)
+
+    async with client:
+        result = await run(client, dataset, args.duration, args.concurrency, args.warmup)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--base-url", help="benchmark a running server instead of main:app in-process")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42, help="random seed of the workload")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=10, help="allowed regression in percent")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
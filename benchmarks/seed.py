@@ -0,0 +1,114 @@
+"""
+Seeds the benchmark database with a configurable data volume.
+Rows are generated server-side with generate_series, so millions of
+rows take seconds instead of round trips:
+
+    python -m benchmarks.seed --categories 50 --users 10000 --news 1000000 --comments 10000000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from src.database import Base, engine
+from src.news.models import *
+from src.users.models import *
+from src.media.models import *
+
+
+STATEMENTS = [
+    (
+        "categories",
+        """
+        INSERT INTO category (name, created)
+        SELECT 'Category ' || g, now() - g * interval '1 day'
+        FROM generate_series(1, :categories) AS g
+        """,
+    ),
+    (
+        "users",
+        """
+        INSERT INTO "user" (id, email, hashed_password, is_active, is_superuser, is_verified, full_name)
+        SELECT gen_random_uuid(), 'bench' || g || '@example.com', 'not-a-hash', true, false, true, 'Bench user ' || g
+        FROM generate_series(1, :users) AS g
+        """,
+    ),
+    (
+        "news",
+        """
+        INSERT INTO news (title, content, images, created, updated, category_id, comments_count)
+        SELECT
+            'Benchmark news ' || g,
+            repeat('Lorem ipsum dolor sit amet ' || g || ' ', 20),
+            ARRAY['media/bench-' || (g % 100) || '.jpg'],
+            now() - g * interval '1 second',
+            now() - g * interval '1 second',
+            (SELECT min(id) FROM category) + g % :categories,
+            0
+        FROM generate_series(1, :news) AS g
+        """,
+    ),
+    (
+        "comments",
+        """
+        WITH users AS (SELECT array_agg(id) AS ids, count(*) AS total FROM "user"),
+             bounds AS (SELECT min(id) AS first_id, count(*) AS total FROM news)
+        INSERT INTO comment (text, created, updated, news_id, user_id)
+        SELECT
+            'Benchmark comment ' || g,
+            now() - g * interval '100 milliseconds',
+            now() - g * interval '100 milliseconds',
+            bounds.first_id + (g * 7919) % bounds.total,
+            users.ids[1 + g % users.total]
+        FROM generate_series(1, :comments) AS g, users, bounds
+        """,
+    ),
+    (
+        "comments_count",
+        """
+        UPDATE news SET comments_count = counts.total
+        FROM (SELECT news_id, count(*) AS total FROM comment GROUP BY news_id) AS counts
+        WHERE news.id = counts.news_id
+        """,
+    ),
+    ("analyze", "ANALYZE"),
+]
+
+
+async def seed(volume: dict[str, int], reset: bool) -> None:
+    async with engine.begin() as connection:
+        if reset:
+            await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    for name, statement in STATEMENTS:
+        started = time.perf_counter()
+        async with engine.begin() as connection:
+            await connection.execute(text(statement), volume)
+        print(f"{name}: {time.perf_counter() - started:.1f}s")
+
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.seed")
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--news", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--no-reset", action="store_true", help="append to existing tables")
+    args = parser.parse_args()
+
+    volume = {
+        "categories": args.categories,
+        "users": args.users,
+        "news": args.news,
+        "comments": args.comments,
+    }
+    asyncio.run(seed(volume, reset=not args.no_reset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Microbenchmark of list serialization: FastAPI's response_model path
+versus the precompiled TypeAdapter path of src.responses.
+
+    python -m benchmarks.serialization --items 100 --rounds 2000
+"""
+
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from src.news.models import News
+from src.news.schemas import NewsReadSchema
+from src.responses import dump_json
+
+
+def make_news(count: int) -> list[News]:
+    now = datetime.utcnow()
+    return [
+        News(
+            id=index,
+            title=f"Benchmark news {index}",
+            content="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 10,
+            images=[f"media/bench-{index}.jpg", f"media/bench-{index}-2.jpg"],
+            category_id=index % 50,
+            created=now - timedelta(seconds=index),
+            updated=now - timedelta(seconds=index),
+        )
+        for index in range(count)
+    ]
+
+
+def fastapi_path(adapter: TypeAdapter, news: list[News]) -> bytes:
+    # what serialize_response + JSONResponse.render do for response_model
+    content = adapter.dump_python(adapter.validate_python(news, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    parser.add_argument("--items", type=int, default=100, help="objects per page")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(list[NewsReadSchema])
+    news = make_news(args.items)
+
+    if fastapi_path(adapter, news) != dump_json(adapter, news):
+        raise SystemExit("Serialized bodies differ")
+
+    results = {}
+    for name, function in (("response_model", fastapi_path), ("type_adapter", dump_json)):
+        seconds = min(timeit.repeat(lambda: function(adapter, news), number=args.rounds, repeat=5))
+        results[name] = seconds / args.rounds * 1_000_000
+
+    for name, microseconds in results.items():
+        print(f"{name:>15}: {microseconds:9.1f} us per {args.items}-item page")
+    print(f"{'speedup':>15}: {results['response_model'] / results['type_adapter']:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
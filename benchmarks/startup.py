@@ -0,0 +1,89 @@
+"""
+Cold start benchmark: time from `import main` to the first response.
+
+Every run is a fresh interpreter. Compare a schema generated on demand
+with a prebuilt one:
+
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --runs 10 --prebuilt-openapi
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+PROBE = """
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+import httpx
+import main
+imported = time.perf_counter()
+
+
+async def first_request():
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            response = await client.get(sys.argv[1])
+        return ready, time.perf_counter(), response.status_code
+
+
+ready, responded, status = asyncio.run(first_request())
+print(json.dumps({
+    "import_s": imported - started,
+    "lifespan_s": ready - imported,
+    "first_request_s": responded - ready,
+    "total_s": responded - started,
+    "status": status,
+}))
+"""
+
+
+def run_once(path: str, env: dict[str, str]) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE, path], env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/openapi.json", help="first request")
+    parser.add_argument("--prebuilt-openapi", action="store_true", help="serve the schema from a file built up front")
+    parser.add_argument("--output", help="write the JSON result to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.prebuilt_openapi:
+        schema = os.path.join(tempfile.mkdtemp(), "openapi.json")
+        subprocess.run([sys.executable, "-m", "src.openapi", schema], env=env, check=True)
+        env["OPENAPI_SCHEMA_PATH"] = schema
+
+    runs = [run_once(args.path, env) for _ in range(args.runs)]
+    phases = ("import_s", "lifespan_s", "first_request_s", "total_s")
+    result = {
+        "runs": args.runs,
+        "path": args.path,
+        "prebuilt_openapi": args.prebuilt_openapi,
+        "statuses": sorted({run["status"] for run in runs}),
+        "median": {phase: round(statistics.median(run[phase] for run in runs), 4) for phase in phases},
+        "max": {phase: round(max(run[phase] for run in runs), 4) for phase in phases},
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
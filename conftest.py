@@ -0,0 +1,35 @@
+"""
+Shared pytest fixtures
+"""
+
+from contextlib import contextmanager
+
+import pytest
+
+from src.query_budget import track_queries
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Fails the test when the block runs more SQL statements than allowed:
+
+        with max_queries(3):
+            await client.get("/news/1")
+    """
+
+    @contextmanager
+    def check(limit: int):
+        with track_queries() as query_log:
+            yield query_log
+        assert query_log.count <= limit, (
+            f"{query_log.count} queries executed, at most {limit} expected:\n"
+            + "\n".join(query_log.statements)
+        )
+
+    return check
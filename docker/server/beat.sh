@@ -0,0 +1,6 @@
+#!/bin/sh
+
+cd /app
+
+# exactly one scheduler per deployment, workers only consume
+exec celery -A src.celery.celery_app beat --loglevel=info
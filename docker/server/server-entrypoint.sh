@@ -2,6 +2,11 @@
 
 cd /app
 
-alembic upgrade head
+alembic upgrade heads
+
+# shared by all uvicorn workers, stale samples of previous runs are dropped
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 
 exec fastapi run --host 0.0.0.0 --port 8000
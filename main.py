@@ -1,34 +1,65 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.openapi.utils import get_openapi
 
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.database import (
+    ReadYourWritesMiddleware,
+    pool_timeout_handler,
+    replicas,
+    warm_up_engines,
+    dispose_engines,
+)
+from src.environs import DB_READ_YOUR_WRITES_SECONDS
+from src.redis import redis_client
 from src.news import categories_router, news_router, comments_router
+from src.news.services import category_cache
 from src.users import users_router
 from src.media import media_router
+from src.media.images import derivative_cache
+from src.metrics import PrometheusMiddleware, metrics_router
+from src.openapi import install_openapi
+from src.query_budget import QueryBudgetMiddleware
+from src.rate_limit import RateLimitMiddleware
+from src.realtime import event_broker, realtime_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens DB connections before the first request and closes clients on shutdown.
+    Everything else connects on first use
+    """
+    await warm_up_engines()
+    yield
+    await event_broker.close()
+    await category_cache.close()
+    await dispose_engines()
+    await redis_client.aclose()
+    derivative_cache.shutdown()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan)
+
+    if replicas and DB_READ_YOUR_WRITES_SECONDS:
+        app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(QueryBudgetMiddleware)
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(PrometheusMiddleware)
+    app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
+    app.include_router(router=categories_router)
+    app.include_router(router=news_router)
+    app.include_router(router=users_router)
+    app.include_router(router=comments_router)
+    app.include_router(router=media_router)
+    app.include_router(router=metrics_router)
+    app.include_router(router=realtime_router)
+
+    install_openapi(app)
+    return app
 
 
-app = FastAPI()
-
-app.include_router(router=categories_router)
-app.include_router(router=news_router)
-app.include_router(router=users_router)
-app.include_router(router=comments_router)
-app.include_router(router=media_router)
-
-openapi_schema = get_openapi(
-        title="FastNews API",
-        version="1.0.0",
-        description="This is a simple FastAPI project with JWT authentication, SQLAlchemy ORM, and PostgreSQL database, alembic for migrations, and docker-compose for development and production environments.",
-        routes=app.routes,
-    )
-openapi_schema["components"]["securitySchemes"] = {
-    "BearerAuth": {
-        "type": "http",
-        "scheme": "bearer",
-        "bearerFormat": "JWT",
-    }
-}
-for path in openapi_schema["paths"].values():
-    for method in path:
-        path[method]["security"] = [{"BearerAuth": []}]
-
-app.openapi_schema = openapi_schema
\ No newline at end of file
+app = create_app()
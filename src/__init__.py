@@ -1,5 +1,5 @@
 from .database import *
 from .environs import *
-from .celery import *
 from .redis import *
+from .cache import response_cache
 from .manager import DBManager
@@ -0,0 +1,260 @@
+"""
+Redis read-through cache for serialized responses
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from redis.exceptions import RedisError
+
+from .environs import CACHE_ENABLED, CACHE_TTL, CACHE_VERSION_TTL, HTTP_ETAGS_ENABLED, HTTP_CACHE_CONTROL
+from .metrics import cache_requests
+from .redis import redis_client
+from .responses import dump_json
+
+
+logger = logging.getLogger(__name__)
+
+
+# KEYS[1] - entry key, KEYS[2..] - version counters of the entry tags;
+# ARGV[1] - version TTL, ARGV[2] - "1" to read the entry.
+# A missing counter starts from the current time, so an evicted one never repeats a version.
+# An entry stored under other versions than the current ones is reported as a miss
+GET_SCRIPT = """
+local versions = {}
+for index = 2, #KEYS do
+    local version = redis.call('GET', KEYS[index])
+    if not version then
+        local clock = redis.call('TIME')
+        version = string.format('%s%06d', clock[1], tonumber(clock[2]))
+        redis.call('SET', KEYS[index], version, 'EX', ARGV[1])
+    else
+        redis.call('EXPIRE', KEYS[index], ARGV[1])
+    end
+    versions[#versions + 1] = version
+end
+
+local entry = {}
+if ARGV[2] == '1' and redis.call('HGET', KEYS[1], 'versions') == table.concat(versions, ':') then
+    entry = redis.call('HGETALL', KEYS[1])
+end
+return {entry, versions}
+"""
+
+# KEYS[1] - entry key, KEYS[2..n+1] - tag sets, KEYS[n+2..] - their version counters;
+# ARGV[1] - TTL, ARGV[2] - versions read before loading, ARGV[3..] - entry fields and values.
+# Skips the write when a tag was invalidated while the entry was loaded
+SET_SCRIPT = """
+local tags = (#KEYS - 1) / 2
+local versions = {}
+for index = 1, tags do
+    versions[index] = redis.call('GET', KEYS[tags + 1 + index]) or ''
+end
+if table.concat(versions, ':') ~= ARGV[2] then
+    return 0
+end
+
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'versions', ARGV[2], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+for index = 2, tags + 1 do
+    redis.call('SADD', KEYS[index], KEYS[1])
+    redis.call('EXPIRE', KEYS[index], ARGV[1])
+end
+return 1
+"""
+
+# KEYS - tag sets followed by their version counters; deletes every entry
+# registered under the tags and bumps the versions of the tags
+INVALIDATE_SCRIPT = """
+local tags = #KEYS / 2
+local removed = 0
+for index = 1, tags do
+    local members = redis.call('SMEMBERS', KEYS[index])
+    for i = 1, #members, 500 do
+        removed = removed + redis.call('DEL', unpack(members, i, math.min(i + 499, #members)))
+    end
+    redis.call('DEL', KEYS[index])
+    -- a missing counter is created on the next read, from the clock
+    if redis.call('EXISTS', KEYS[tags + index]) == 1 then
+        redis.call('INCR', KEYS[tags + index])
+    end
+end
+return removed
+"""
+
+
+@dataclass
+class CachedResponse:
+    """
+    Serialized response body with the headers that belong to it
+    """
+    body: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+    media_type: str = "application/json"
+    etag: str = ""
+
+    def __post_init__(self) -> None:
+        # derived from the body, so a validator always describes the bytes it was sent with
+        if not self.etag:
+            self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:32]}"'
+
+    def to_response(self, cache_status: str) -> Response:
+        response = Response(content=self.body, media_type=self.media_type, headers=self.headers)
+        response.headers["X-Cache"] = cache_status
+        return response
+
+
+def serialize(adapter: TypeAdapter, value: object, headers: dict[str, str] | None = None) -> CachedResponse:
+    """
+    Validates ORM objects against the response schema and dumps them to JSON bytes
+    """
+    return CachedResponse(body=dump_json(adapter, value), headers=headers or {})
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Weak comparison of If-None-Match against an ETag, as required for GET
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+class ResponseCache():
+    """
+    Stores response bytes in Redis hashes with a TTL.
+    Every entry is registered in one or more tag sets, so writes
+    can drop exactly the entries that depend on the changed rows
+    """
+
+    def __init__(self, prefix: str = "cache", ttl: int = CACHE_TTL, enabled: bool = CACHE_ENABLED) -> None:
+        self.prefix = prefix
+        self.ttl = ttl
+        self.enabled = enabled
+        self._get = redis_client.register_script(GET_SCRIPT)
+        self._set = redis_client.register_script(SET_SCRIPT)
+        self._invalidate = redis_client.register_script(INVALIDATE_SCRIPT)
+
+    def key(self, namespace: str, *parts: object) -> str:
+        return ":".join([self.prefix, namespace, *(str(part) for part in parts)])
+
+    def tag(self, name: str) -> str:
+        return f"{self.prefix}:tag:{name}"
+
+    def version(self, name: str) -> str:
+        return f"{self.prefix}:version:{name}"
+
+
+    async def get(
+        self,
+        key: str,
+        tags: list[str],
+        read_entry: bool = True,
+    ) -> tuple[CachedResponse | None, str]:
+        """
+        Returns the entry, if it was stored under the current tag versions,
+        and those versions
+        """
+        entry, versions = await self._get(
+            keys=[key, *[self.version(tag) for tag in tags]],
+            args=[CACHE_VERSION_TTL, int(read_entry)],
+        )
+        versions = b":".join(versions).decode()
+        if not entry:
+            return None, versions
+
+        fields = dict(zip(entry[::2], entry[1::2]))
+        headers = {
+            name[2:].decode(): value.decode()
+            for name, value in fields.items() if name.startswith(b"h:")
+        }
+        cached = CachedResponse(
+            body=fields[b"body"],
+            headers=headers,
+            media_type=fields[b"type"].decode(),
+            etag=fields[b"etag"].decode(),
+        )
+        return cached, versions
+
+
+    async def set(self, key: str, cached: CachedResponse, tags: list[str], versions: str) -> bool:
+        """
+        Stores an entry under the given tags, unless one of them
+        was invalidated after `versions` were read
+        """
+        mapping = {"body": cached.body, "type": cached.media_type, "etag": cached.etag}
+        mapping.update({f"h:{name}": value for name, value in cached.headers.items()})
+
+        stored = await self._set(
+            keys=[key, *[self.tag(tag) for tag in tags], *[self.version(tag) for tag in tags]],
+            args=[self.ttl, versions, *[item for pair in mapping.items() for item in pair]],
+        )
+        return bool(stored)
+
+
+    async def invalidate(self, *tags: str) -> None:
+        """
+        Drops every entry registered under any of the tags
+        """
+        if not (self.enabled or HTTP_ETAGS_ENABLED):
+            return
+        try:
+            keys = [self.tag(tag) for tag in tags] + [self.version(tag) for tag in tags]
+            await self._invalidate(keys=keys)
+        except RedisError:
+            logger.exception("Cache invalidation failed for %s", tags)
+
+
+    async def fetch(
+        self,
+        key: str,
+        tags: list[str],
+        loader: Callable[[], Awaitable[CachedResponse]],
+        request: Request | None = None,
+    ) -> Response:
+        """
+        Serves a response from the cache, calling loader on a miss.
+        Redis errors fall back to the loader so the cache never breaks reads.
+        With a request, answers 304 when If-None-Match matches the ETag of the
+        stored body, which on a hit needs no database work at all
+        """
+        conditional = request is not None and HTTP_ETAGS_ENABLED
+        if not self.enabled and not conditional:
+            cache_requests.labels(tags[0], "BYPASS").inc()
+            return (await loader()).to_response("BYPASS")
+
+        cached, versions = None, None
+        try:
+            cached, versions = await self.get(key, tags, read_entry=self.enabled)
+        except RedisError:
+            logger.exception("Cache read failed for %s", key)
+
+        status = "HIT"
+        if cached is None:
+            cached = await loader()
+            status = "BYPASS"
+            if self.enabled and versions is not None:
+                status = "MISS"
+                try:
+                    await self.set(key, cached, tags, versions)
+                except RedisError:
+                    logger.exception("Cache write failed for %s", key)
+        cache_requests.labels(tags[0], status).inc()
+
+        if not conditional:
+            return cached.to_response(status)
+
+        headers = {"ETag": cached.etag, "Cache-Control": HTTP_CACHE_CONTROL}
+        if etag_matches(request.headers.get("If-None-Match"), cached.etag):
+            return Response(status_code=304, headers=headers)
+        response = cached.to_response(status)
+        response.headers.update(headers)
+        return response
+
+response_cache = ResponseCache()
@@ -1,14 +1,56 @@
+import asyncio
+import json
+import logging
 import smtplib
+import time
 from email.mime.text import MIMEText
 
+import redis
 from pydantic import BaseModel
 
+from celery import Task
 from celery.app import Celery
+from celery.signals import worker_process_shutdown
 
-from src import REDIS_URL, SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD
+from src import (
+    REDIS_URL,
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_USER,
+    SMTP_PASSWORD,
+    SMTP_TIMEOUT,
+    SMTP_BATCH_SIZE,
+    SMTP_BATCH_INTERVAL,
+    MEDIA_BLOB_GRACE_SECONDS,
+    NEWS_VIEWS_FLUSH_SECONDS,
+    redis_client,
+)
+from src.metrics import celery_enqueue_seconds
 
 
+logger = logging.getLogger(__name__)
+
+VERIFICATION_QUEUE = "mail:verification"
+# codes the SMTP server permanently refused, kept for inspection
+VERIFICATION_DEAD_LETTER = "mail:verification:dead"
+VERIFICATION_DEAD_LETTER_SIZE = 1000
+
 celery_app = Celery("celery", broker=REDIS_URL, backend=REDIS_URL)
+celery_app.conf.beat_schedule = {
+    "collect-media-garbage": {
+        "task": "tasks.collect_media_garbage",
+        "schedule": MEDIA_BLOB_GRACE_SECONDS,
+    },
+    "flush-news-views": {
+        "task": "tasks.flush_news_views",
+        "schedule": NEWS_VIEWS_FLUSH_SECONDS,
+    },
+}
+if SMTP_BATCH_SIZE > 1:
+    celery_app.conf.beat_schedule["flush-verification-codes"] = {
+        "task": "tasks.flush_verification_codes",
+        "schedule": SMTP_BATCH_INTERVAL,
+    }
 
 
 class TaskStatus(BaseModel):
@@ -21,18 +63,166 @@ def print_user_data(user: dict) -> bool:
         print(f"{key}: {value}")
     return True
 
+
+class SMTPConnection():
+    """
+    SMTP session kept open between tasks of one worker process.
+    Connects on first use and reconnects once when the server dropped the session
+    """
+
+    def __init__(self) -> None:
+        self._server: smtplib.SMTP | None = None
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(host=SMTP_HOST, port=int(SMTP_PORT or 0), timeout=SMTP_TIMEOUT)
+        try:
+            server.starttls()
+            server.login(user=SMTP_USER, password=SMTP_PASSWORD)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+    def close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    def send(self, message: MIMEText) -> None:
+        for attempt in range(2):
+            if self._server is None:
+                self._server = self._connect()
+            try:
+                self._server.sendmail(from_addr=SMTP_USER, to_addrs=message["To"], msg=message.as_string())
+                return
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self._server = None
+                if attempt:
+                    raise
+
+
+smtp_connection = SMTPConnection()
+
+
+@worker_process_shutdown.connect
+def close_smtp_connection(**kwargs) -> None:
+    smtp_connection.close()
+
+
+def verification_message(email: str, code: str) -> MIMEText:
+    message = MIMEText(code)
+    message['Subject'] = "NovaNews email verification"
+    message['From'] = SMTP_USER
+    message['To'] = email
+    return message
+
+
 @celery_app.task(name='tasks.send_verification_code')
 def send_verification_code(email: str, code: str) -> bool:
-    server = smtplib.SMTP(host=SMTP_HOST, port=SMTP_PORT)
-    server.connect(host=SMTP_HOST, port=SMTP_PORT)
-    server.starttls()
-
     try:
-        server.login(user=SMTP_USER, password=SMTP_PASSWORD)
-        message = MIMEText(code)
-        message['Subject'] = "NovaNews email verification"
-
-        server.sendmail(from_addr=SMTP_USER, to_addrs=email, msg=message.as_string())
+        smtp_connection.send(verification_message(email, code))
         return True
     except smtplib.SMTPAuthenticationError:
-        return False
\ No newline at end of file
+        return False
+
+
+@celery_app.task(name="tasks.flush_verification_codes")
+def flush_verification_codes() -> int:
+    """
+    Sends the queued verification codes over one SMTP session.
+    Codes refused with a permanent (5xx) reply go to the dead letter list,
+    on transient or connection errors the unsent codes go back to the head of the queue
+    """
+    queue = redis.Redis.from_url(REDIS_URL)
+    sent = 0
+    try:
+        while batch := queue.lpop(VERIFICATION_QUEUE, SMTP_BATCH_SIZE):
+            for index, payload in enumerate(batch):
+                email, code = json.loads(payload)
+                try:
+                    smtp_connection.send(verification_message(email, code))
+                except smtplib.SMTPRecipientsRefused:
+                    # a bad address must not block the rest of the queue
+                    continue
+                except smtplib.SMTPResponseException as exc:
+                    # failed authentication is a configuration problem, not one of this message
+                    if not 500 <= exc.smtp_code < 600 or isinstance(exc, smtplib.SMTPAuthenticationError):
+                        queue.lpush(VERIFICATION_QUEUE, *reversed(batch[index:]))
+                        raise
+                    logger.warning("Verification code for %s refused: %s %s", email, exc.smtp_code, exc.smtp_error)
+                    with queue.pipeline() as pipe:
+                        pipe.lpush(VERIFICATION_DEAD_LETTER, payload)
+                        pipe.ltrim(VERIFICATION_DEAD_LETTER, 0, VERIFICATION_DEAD_LETTER_SIZE - 1)
+                        pipe.execute()
+                    continue
+                except (smtplib.SMTPException, OSError):
+                    queue.lpush(VERIFICATION_QUEUE, *reversed(batch[index:]))
+                    raise
+                sent += 1
+    finally:
+        queue.close()
+    return sent
+
+
+async def enqueue(task: Task, *args) -> None:
+    """
+    Publishes a task from async code without blocking the event loop on the broker
+    """
+    started = time.perf_counter()
+    await asyncio.to_thread(task.apply_async, args=args)
+    celery_enqueue_seconds.labels(task.name).observe(time.perf_counter() - started)
+
+
+async def send_verification_email(email: str, code: str) -> None:
+    """
+    Sends right away through a task, or queues the code for the next batch
+    """
+    if SMTP_BATCH_SIZE > 1:
+        await redis_client.rpush(VERIFICATION_QUEUE, json.dumps([email, code]))
+    else:
+        await enqueue(send_verification_code, email, code)
+
+
+@celery_app.task(name="tasks.collect_media_garbage")
+def collect_media_garbage() -> int:
+    """
+    Removes content-addressed blobs that are no longer referenced by any news
+    """
+    from src.database import async_session, engine
+    from src.media.services import MediaBlobService
+
+    async def collect() -> int:
+        try:
+            async with async_session() as db:
+                return await MediaBlobService.collect_garbage(db)
+        finally:
+            # asyncpg connections are bound to the event loop of this run
+            await engine.dispose()
+
+    return asyncio.run(collect())
+
+
+@celery_app.task(name="tasks.flush_news_views")
+def flush_news_views() -> int:
+    """
+    Adds the view counts buffered in Redis to News.views
+    """
+    from redis import asyncio as aioredis
+
+    from src.database import async_session, engine
+    from src.news.services import NewsViewService
+
+    async def flush() -> int:
+        # a client of its own: connections are bound to the event loop of this run
+        redis = aioredis.from_url(REDIS_URL)
+        try:
+            async with async_session() as db:
+                return await NewsViewService.flush(db, redis)
+        finally:
+            await redis.aclose()
+            await engine.dispose()
+
+    return asyncio.run(flush())
@@ -1,15 +1,147 @@
+import asyncio
+import itertools
+import logging
+import time
 from typing import AsyncGenerator, Any
+from uuid import uuid4
 
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession, AsyncEngine, AsyncConnection
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from .environs import *
+from .metrics import db_pool_checkout_seconds, db_pool_checkout_timeouts, instrument_engine
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_async_engine(url=DATABASE_URL)
+PRIMARY_PIN_COOKIE = "db_primary_until"
+
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that reports how long Pool.connect() waits for a free connection.
+    Hold time and usage come from the checkout/checkin events in instrument_engine
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            db_pool_checkout_timeouts.inc()
+            raise
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - started)
+
+
+def engine_options(url: str = DATABASE_URL) -> dict[str, Any]:
+    """
+    Engine URL with pool and asyncpg settings from the environment
+    """
+    connect_args: dict[str, Any] = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    options: dict[str, Any] = {
+        "url": url,
+        "poolclass": TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+    if DB_PGBOUNCER:
+        # no server-side prepared statement may outlive a transaction
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+        separator = "&" if "?" in url else "?"
+        options["url"] = f"{url}{separator}prepared_statement_cache_size=0"
+    return options
+
+
+engine = create_async_engine(**engine_options())
+instrument_engine(engine.sync_engine)
 async_session = async_sessionmaker(bind=engine, expire_on_commit=True)
 
+
+class ReplicaSet():
+    """
+    Round-robin over read replicas. A replica that fails to connect
+    is skipped for DB_REPLICA_RETRY_SECONDS before it is tried again
+    """
+
+    def __init__(self, urls: list[str], retry_seconds: float = DB_REPLICA_RETRY_SECONDS) -> None:
+        self.engines: list[AsyncEngine] = [create_async_engine(**engine_options(url)) for url in urls]
+        for replica in self.engines:
+            instrument_engine(replica.sync_engine)
+        self.sessions = [async_sessionmaker(bind=replica, expire_on_commit=True) for replica in self.engines]
+        self.retry_seconds = retry_seconds
+        self._down_until = [0.0] * len(self.engines)
+        self._counter = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def candidates(self) -> list[int]:
+        """
+        Healthy replicas, starting from the next one in round-robin order
+        """
+        start = next(self._counter)
+        now = time.monotonic()
+        order = [(start + shift) % len(self.engines) for shift in range(len(self.engines))]
+        return [index for index in order if self._down_until[index] <= now]
+
+    def mark_down(self, index: int) -> None:
+        self._down_until[index] = time.monotonic() + self.retry_seconds
+
+
+replicas = ReplicaSet(DB_REPLICA_URLS)
+
+
+async def warm_up_pool(
+    target: AsyncEngine,
+    connections: int = DB_POOL_WARMUP,
+    timeout: float = DB_POOL_WARMUP_TIMEOUT,
+) -> int:
+    """
+    Opens connections concurrently and returns them to the pool.
+    Each one gets `timeout` seconds; failures are logged, the app still starts
+    and connects on demand
+    """
+    async def connect() -> AsyncConnection:
+        connection = await target.connect()
+        try:
+            await connection.exec_driver_sql("SELECT 1")
+        except BaseException:
+            await connection.close()
+            raise
+        return connection
+
+    results = await asyncio.gather(
+        *[asyncio.wait_for(connect(), timeout) for _ in range(connections)], return_exceptions=True
+    )
+    opened = [result for result in results if isinstance(result, AsyncConnection)]
+    for connection in opened:
+        await connection.close()
+    if len(opened) < connections:
+        errors = [result for result in results if isinstance(result, BaseException)]
+        logger.warning("Opened %s of %s connections to %s: %r", len(opened), connections, target.url.host, errors[0])
+    return len(opened)
+
+
+async def warm_up_engines() -> None:
+    await asyncio.gather(warm_up_pool(engine), *[warm_up_pool(replica) for replica in replicas.engines])
+
+
+async def dispose_engines() -> None:
+    await asyncio.gather(engine.dispose(), *[replica.dispose() for replica in replicas.engines])
+
+
 class Base(DeclarativeBase):
     """
     Meta class for sqlalchemy ORM models
@@ -21,3 +153,76 @@ async def get_db() -> AsyncGenerator[Any, AsyncSession]:
     """
     async with async_session() as session:
         yield session
+
+
+def is_pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    return isinstance(exc, (OSError, asyncio.TimeoutError)) or (
+        isinstance(exc, DBAPIError) and exc.connection_invalidated
+    )
+
+
+async def get_read_db(request: Request) -> AsyncGenerator[Any, AsyncSession]:
+    """
+    Courutine for generating a read-only db session on a replica.
+    Falls back to the primary when no replica is healthy or the client
+    has written recently (read-your-writes).
+    The connection is checked out by the first query, so cache hits never touch
+    the pool; a replica whose first query fails to connect is skipped for a while
+    """
+    if replicas and not is_pinned_to_primary(request):
+        candidates = replicas.candidates()
+        if candidates:
+            index = candidates[0]
+            async with replicas.sessions[index]() as session:
+                try:
+                    yield session
+                except BaseException as exc:
+                    if is_connection_error(exc):
+                        replicas.mark_down(index)
+                    raise
+            return
+
+    async with async_session() as session:
+        yield session
+
+
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError) -> JSONResponse:
+    """
+    An exhausted pool is reported as 503 instead of an unhandled error
+    """
+    logger.warning("No database connection within %ss for %s %s", DB_POOL_TIMEOUT, request.method, request.url.path)
+    return JSONResponse(status_code=503, content={"detail": "Database is busy"}, headers={"Retry-After": "1"})
+
+
+class ReadYourWritesMiddleware():
+    """
+    ASGI middleware pinning a client to the primary for a short time after a write.
+    Only installed when replicas are configured
+    """
+
+    def __init__(self, app, seconds: int = DB_READ_YOUR_WRITES_SECONDS) -> None:
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{PRIMARY_PIN_COOKIE}={int(time.time()) + self.seconds}; "
+                    f"HttpOnly; Max-Age={self.seconds}; Path=/; SameSite=lax"
+                )
+                MutableHeaders(scope=message).append("set-cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -11,15 +11,108 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Off by default: a round trip per checkout; pool_recycle and the replica
+# mark-down already handle connections dropped by the server
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# Connections opened at startup so the first requests do not pay for connection setup
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+# Bound of every warm-up connection, an unreachable database must not stall startup
+DB_POOL_WARMUP_TIMEOUT = float(os.getenv("DB_POOL_WARMUP_TIMEOUT", "5"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# PgBouncer in transaction pooling mode can not keep prepared statements between transactions
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+# Comma separated postgresql+asyncpg:// URLs of read replicas
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+# How long a client reads from the primary after its last write, 0 disables pinning
+DB_READ_YOUR_WRITES_SECONDS = int(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+# Requests running more statements are logged with the statements they ran
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", "20"))
+# The same statement repeated this many times in one request is reported as N+1
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "5"))
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 
+# Prebuilt schema from `python -m src.openapi`, generated on the first request when unset
+OPENAPI_SCHEMA_PATH = os.getenv("OPENAPI_SCHEMA_PATH", "")
+
 JWT_SECRET = os.getenv("JWT_SECRET", "SECRET")
 USER_MANAGER_SECRET = os.getenv("USER_MANAGER_SECRET", "SECRET")
 
+# Verified users resolved from JWTs, cached in-process and in Redis
+AUTH_USER_CACHE_ENABLED = os.getenv("AUTH_USER_CACHE_ENABLED", "true").lower() == "true"
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "300"))
+# Other workers drop their in-process copy after this many seconds at most
+AUTH_USER_CACHE_LOCAL_TTL = float(os.getenv("AUTH_USER_CACHE_LOCAL_TTL", "5"))
+AUTH_USER_CACHE_LOCAL_SIZE = int(os.getenv("AUTH_USER_CACHE_LOCAL_SIZE", "10000"))
+
 SMTP_HOST = os.getenv("SMTP_HOST")
 SMTP_PORT = os.getenv("SMTP_PORT")
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Above 1 verification emails are queued in Redis and sent in batches over one SMTP session
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "1"))
+SMTP_BATCH_INTERVAL = float(os.getenv("SMTP_BATCH_INTERVAL", "5"))
+
+MEDIA_ROOT = "media/"
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", str(64 * 1024)))
+MEDIA_MAX_FILE_SIZE = int(os.getenv("MEDIA_MAX_FILE_SIZE", str(10 * 1024 * 1024)))
+MEDIA_MAX_REQUEST_SIZE = int(os.getenv("MEDIA_MAX_REQUEST_SIZE", str(50 * 1024 * 1024)))
+MEDIA_MAX_CONCURRENT_WRITES = int(os.getenv("MEDIA_MAX_CONCURRENT_WRITES", "4"))
+# "filename" keeps client file names, "hash" stores deduplicated content-addressed blobs
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "filename")
+MEDIA_BLOB_ROOT = os.path.join(MEDIA_ROOT, "blobs")
+MEDIA_BLOB_GRACE_SECONDS = int(os.getenv("MEDIA_BLOB_GRACE_SECONDS", "3600"))
+MEDIA_DERIVATIVES_ROOT = os.getenv("MEDIA_DERIVATIVES_ROOT", "media_cache/")
+MEDIA_DERIVATIVES_MAX_SIZE = int(os.getenv("MEDIA_DERIVATIVES_MAX_SIZE", str(1024 * 1024 * 1024)))
+MEDIA_RESIZE_WORKERS = int(os.getenv("MEDIA_RESIZE_WORKERS", "2"))
+MEDIA_MAX_DIMENSION = int(os.getenv("MEDIA_MAX_DIMENSION", "4096"))
+MEDIA_CACHE_CONTROL = os.getenv("MEDIA_CACHE_CONTROL", "public, max-age=86400")
+# Let nginx send files with sendfile through X-Accel-Redirect to internal locations
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", "false").lower() == "true"
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/_protected/media/")
+MEDIA_DERIVATIVES_ACCEL_PREFIX = os.getenv("MEDIA_DERIVATIVES_ACCEL_PREFIX", "/_protected/media_cache/")
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = int(os.getenv("CACHE_TTL", "60"))
+# Tag version counters outlive cache entries and client caches, idle ones expire
+CACHE_VERSION_TTL = int(os.getenv("CACHE_VERSION_TTL", str(7 * 24 * 3600)))
+# ETags of cached endpoints are derived from the stored response body
+HTTP_ETAGS_ENABLED = os.getenv("HTTP_ETAGS_ENABLED", "true").lower() == "true"
+HTTP_CACHE_CONTROL = os.getenv("HTTP_CACHE_CONTROL", "no-cache")
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Overrides of the default limits, e.g. "comments:create=20/60,auth:register=5/3600"
+RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+# Take the client address from X-Real-IP set by nginx
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+# After a Redis error limits are enforced per process for this long
+RATE_LIMIT_FALLBACK_SECONDS = float(os.getenv("RATE_LIMIT_FALLBACK_SECONDS", "10"))
+
+# Events a subscriber may fall behind before it is disconnected
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "256"))
+REALTIME_SEND_TIMEOUT = float(os.getenv("REALTIME_SEND_TIMEOUT", "10"))
+REALTIME_HEARTBEAT_SECONDS = float(os.getenv("REALTIME_HEARTBEAT_SECONDS", "15"))
+REALTIME_MAX_CHANNELS = int(os.getenv("REALTIME_MAX_CHANNELS", "20"))
+
+# Categories are kept in every worker and dropped on writes announced through Redis
+CATEGORY_CACHE_ENABLED = os.getenv("CATEGORY_CACHE_ENABLED", "true").lower() == "true"
+CATEGORY_CACHE_REVALIDATE_SECONDS = float(os.getenv("CATEGORY_CACHE_REVALIDATE_SECONDS", "60"))
 
-MEDIA_ROOT = "media/"
\ No newline at end of file
+NEWS_EMBEDDED_COMMENTS = int(os.getenv("NEWS_EMBEDDED_COMMENTS", "10"))
+NEWS_INGEST_BATCH_SIZE = int(os.getenv("NEWS_INGEST_BATCH_SIZE", "1000"))
+# Views older than this weigh half as much in the trending ranking
+NEWS_TRENDING_HALF_LIFE = int(os.getenv("NEWS_TRENDING_HALF_LIFE", str(6 * 3600)))
+NEWS_TRENDING_SIZE = int(os.getenv("NEWS_TRENDING_SIZE", "1000"))
+NEWS_VIEWS_FLUSH_SECONDS = int(os.getenv("NEWS_VIEWS_FLUSH_SECONDS", "60"))
+NEWS_VIEWS_FLUSH_BATCH = int(os.getenv("NEWS_VIEWS_FLUSH_BATCH", "1000"))
+# Upper bound of one flush run, a crashed run holds the lock until it expires
+NEWS_VIEWS_FLUSH_LOCK_SECONDS = int(os.getenv("NEWS_VIEWS_FLUSH_LOCK_SECONDS", "300"))
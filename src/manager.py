@@ -1,22 +1,36 @@
 from typing import Sequence, Type, Any
 
-from sqlalchemy import select, delete
+from sqlalchemy import select, insert, delete, update, tuple_
+from sqlalchemy.engine import RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .database import Base
+from .pagination import decode_cursor, next_cursor_for
 
 class DBManager():
 
+    @staticmethod
+    def from_row(model: Type[Base], row: RowMapping) -> Base:
+        """
+        Builds a detached instance from a RETURNING row, so reading it
+        after commit never triggers another round trip
+        """
+        return model(**row)
+
+
     @staticmethod
     async def get_objects(
         db: AsyncSession,
         model: Type[Base],
         filters: dict[str, Any] | None = None,
         offset: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        cursor: str | None = None,
     ) -> Sequence[Base]:
         """
-        Возвращает список объектов с фильтрацией
+        Возвращает список объектов с фильтрацией.
+        Объекты отсортированы по (created, id) от новых к старым;
+        при переданном cursor используется keyset-пагинация вместо offset
         """
         query = select(model)
 
@@ -24,11 +38,39 @@ class DBManager():
             for field, value in filters.items():
                 query = query.where(getattr(model, field) == value)
 
-        query = query.offset(offset).limit(limit)
+        if cursor:
+            query = query.where(tuple_(model.created, model.id) < decode_cursor(cursor))
+        elif offset:
+            query = query.offset(offset)
+
+        query = query.order_by(model.created.desc(), model.id.desc()).limit(limit)
         result = await db.execute(query)
         return result.scalars().all()
 
 
+    @staticmethod
+    async def get_page(
+        db: AsyncSession,
+        model: Type[Base],
+        filters: dict[str, Any] | None = None,
+        offset: int = 0,
+        limit: int = 10,
+        cursor: str | None = None,
+    ) -> tuple[Sequence[Base], str | None]:
+        """
+        Возвращает страницу объектов и курсор следующей страницы
+        """
+        objects = await DBManager.get_objects(
+            db=db,
+            model=model,
+            filters=filters,
+            offset=offset,
+            limit=limit,
+            cursor=cursor,
+        )
+        return objects, next_cursor_for(objects, limit)
+
+
     @staticmethod
     async def get_object(
         db: AsyncSession,
@@ -56,16 +98,15 @@ class DBManager():
         **kwargs
     ) -> Base:
         """
-        Создаёт объект в БД
+        Создаёт объект в БД одним INSERT ... RETURNING
         """
-        instance = model(**kwargs)
-        db.add(instance)
+        query = insert(model).values(**kwargs).returning(*model.__table__.columns)
+        row = (await db.execute(query)).mappings().one()
 
         if commit:
             await db.commit()
-            await db.refresh(instance)
 
-        return instance
+        return DBManager.from_row(model, row)
 
 
     @staticmethod
@@ -75,16 +116,23 @@ class DBManager():
         field: str,
         value: Any,
         commit: bool = False,
-    ) -> None:
+        filters: dict[str, Any] | None = None,
+    ) -> Base | None:
         """
-        Method deletes a model instance
+        Method deletes a model instance with DELETE ... RETURNING.
+        Returns the deleted row, or None when nothing matched
         """
         query = delete(model).where(getattr(model, field)==value)
-        await db.execute(query)
+        for filter_field, filter_value in (filters or {}).items():
+            query = query.where(getattr(model, filter_field) == filter_value)
+        query = query.returning(*model.__table__.columns).execution_options(synchronize_session=False)
+        row = (await db.execute(query)).mappings().one_or_none()
 
         if commit:
             await db.commit()
 
+        return None if row is None else DBManager.from_row(model, row)
+
 
     @staticmethod
     async def update_object(
@@ -93,26 +141,39 @@ class DBManager():
         field: str,
         value: Any,
         commit: bool = False,
+        filters: dict[str, Any] | None = None,
         **kwargs
     ) -> Base | None:
         """
-        Method updates a model instance
+        Method updates a model instance with a single UPDATE ... RETURNING.
+        filters are added to the WHERE clause (e.g. ownership checks);
+        returns None when no row matches
         """
-        query = select(model).where(getattr(model, field) == value)
-        result = await db.execute(query)
-        instance = result.scalar_one_or_none()
-
-        if instance is None:
+        conditions = [getattr(model, field) == value]
+        for filter_field, filter_value in (filters or {}).items():
+            conditions.append(getattr(model, filter_field) == filter_value)
+
+        if kwargs:
+            query = (
+                update(model)
+                .where(*conditions)
+                .values(**kwargs)
+                .returning(*model.__table__.columns)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            # nothing to change, read the row back under the same conditions
+            query = select(*model.__table__.columns).where(*conditions)
+
+        row = (await db.execute(query)).mappings().one_or_none()
+
+        if row is None:
             return None
 
-        for field, value in kwargs.items():
-            setattr(instance, field, value)
-
         if commit:
             await db.commit()
-            await db.refresh(instance)
 
-        return instance
+        return DBManager.from_row(model, row)
 
 
     @staticmethod
@@ -122,27 +183,53 @@ class DBManager():
         field: str,
         value: Any,
         commit: bool = False,
+        filters: dict[str, Any] | None = None,
         **kwargs
     ) -> Base | None:
         """
-        Method partially updates a model instance
+        Method partially updates a model instance, skipping empty values
         """
-        query = select(model).where(getattr(model, field) == value)
-        result = await db.execute(query)
-        instance = result.scalar_one_or_none()
+        values = {
+            name: new_value for name, new_value in kwargs.items()
+            if name in model.__table__.columns and new_value
+        }
+        return await DBManager.update_object(
+            db=db,
+            model=model,
+            field=field,
+            value=value,
+            commit=commit,
+            filters=filters,
+            **values
+        )
 
-        if instance is None:
-            return None
 
-        for field, value in kwargs.items():
-            if field in model.__table__.columns and value:
-                setattr(instance, field, value)
+    @staticmethod
+    async def increment(
+        db: AsyncSession,
+        model: Type[Base],
+        field: str,
+        value: Any,
+        column: str,
+        amount: int = 1,
+        commit: bool = False,
+    ) -> bool:
+        """
+        Atomically adds amount to a counter column without loading the row.
+        Returns whether the row exists
+        """
+        query = (
+            update(model)
+            .where(getattr(model, field) == value)
+            .values({column: getattr(model, column) + amount})
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(query)
 
         if commit:
             await db.commit()
-            await db.refresh(instance)
 
-        return instance
+        return result.rowcount > 0
 
 
     @staticmethod
@@ -2,4 +2,6 @@
 __init__.py
 """
 
-from .routers import router as media_router
\ No newline at end of file
+from .models import *
+from .services import *
+from .routers import router as media_router
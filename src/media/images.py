@@ -0,0 +1,214 @@
+"""
+On-demand image derivatives with a size-bounded disk cache
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from uuid import uuid4
+
+from src.environs import (
+    MEDIA_DERIVATIVES_ROOT,
+    MEDIA_DERIVATIVES_MAX_SIZE,
+    MEDIA_RESIZE_WORKERS,
+)
+
+
+FORMATS = {
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+}
+
+
+class InvalidImageError(Exception):
+    """
+    The source is an image file that can not be decoded: truncated, corrupt or too large
+    """
+
+
+def render_derivative(
+    source: str,
+    target: str,
+    width: int | None,
+    height: int | None,
+    image_format: str,
+    quality: int,
+) -> None:
+    """
+    Resizes an image keeping its aspect ratio. Runs inside a worker process.
+    Decoding errors are raised as InvalidImageError, write errors as they are
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    pil_format, _ = FORMATS[image_format]
+    temp_path = f"{target}.{uuid4().hex}.part"
+
+    try:
+        with Image.open(source) as image:
+            # exif_transpose returns a copy, thumbnail loads it before the source is closed
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width or image.width, height or image.height), Image.Resampling.LANCZOS)
+            if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+    except UnidentifiedImageError:
+        raise
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise InvalidImageError(str(exc)) from None
+
+    try:
+        image.save(temp_path, format=pil_format, quality=quality, optimize=True)
+        os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class DerivativeCache():
+    """
+    Renders derivatives in a process pool and keeps them on disk.
+    The cache is evicted in least-recently-used order once it grows
+    past max_size; hits refresh the file mtime used as the LRU clock
+    """
+
+    def __init__(
+        self,
+        root: str = MEDIA_DERIVATIVES_ROOT,
+        max_size: int = MEDIA_DERIVATIVES_MAX_SIZE,
+        workers: int = MEDIA_RESIZE_WORKERS,
+    ) -> None:
+        self.root = root
+        self.max_size = max_size
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending: dict[str, asyncio.Task] = {}
+        self._size: int | None = None
+        self._evicting = False
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # forking a threaded event loop process can copy held locks into the child
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver")
+            )
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def path_for(
+        self,
+        source: str,
+        mtime: float,
+        width: int | None,
+        height: int | None,
+        image_format: str,
+        quality: int,
+    ) -> str:
+        key = f"{source}:{mtime}:{width}:{height}:{image_format}:{quality}"
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}{FORMATS[image_format][1]}")
+
+
+    async def get(
+        self,
+        source: str,
+        width: int | None,
+        height: int | None,
+        image_format: str,
+        quality: int,
+    ) -> str:
+        """
+        Returns the path of the derivative, rendering it on a miss.
+        Concurrent requests for the same variant share a single render; it runs
+        in a task of its own, so a client that disconnects does not cancel it for the others
+        """
+        mtime = (await asyncio.to_thread(os.stat, source)).st_mtime
+        target = self.path_for(source, mtime, width, height, image_format, quality)
+
+        task = self._pending.get(target)
+        if task is None:
+            task = asyncio.create_task(self._ensure(source, target, width, height, image_format, quality))
+            self._pending[target] = task
+            task.add_done_callback(lambda done: self._finished(target, done))
+        await asyncio.shield(task)
+        return target
+
+
+    def _finished(self, target: str, task: asyncio.Task) -> None:
+        if self._pending.get(target) is task:
+            del self._pending[target]
+        # every waiter may be gone, the exception is retrieved so it is not logged as lost
+        if not task.cancelled():
+            task.exception()
+
+
+    async def _ensure(
+        self,
+        source: str,
+        target: str,
+        width: int | None,
+        height: int | None,
+        image_format: str,
+        quality: int,
+    ) -> None:
+        try:
+            await asyncio.to_thread(os.utime, target)
+            return
+        except FileNotFoundError:
+            pass
+
+        await asyncio.to_thread(os.makedirs, os.path.dirname(target), exist_ok=True)
+        await asyncio.get_running_loop().run_in_executor(
+            self.pool, render_derivative, source, target, width, height, image_format, quality
+        )
+
+        size = (await asyncio.to_thread(os.stat, target)).st_size
+        if self._size is not None:
+            self._size += size
+        if (self._size is None or self._size > self.max_size) and not self._evicting:
+            self._evicting = True
+            try:
+                self._size = await asyncio.to_thread(self._evict)
+            finally:
+                self._evicting = False
+
+
+    def _evict(self) -> int:
+        """
+        Deletes least recently used derivatives until the cache is
+        below 90% of max_size. Returns the remaining size
+        """
+        entries = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_size:
+            return total
+
+        entries.sort()
+        low_watermark = self.max_size * 0.9
+        for _, size, path in entries:
+            if total <= low_watermark:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        return total
+
+
+derivative_cache = DerivativeCache()
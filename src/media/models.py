@@ -0,0 +1,22 @@
+"""
+SQLalchemy ORM models
+"""
+
+from datetime import datetime
+
+from sqlalchemy import String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.database import Base
+
+
+class MediaBlob(Base):
+    """
+    Content-addressed media blob with the number of news rows referencing it
+    """
+    __tablename__ = "media_blob"
+
+    path: Mapped[str] = mapped_column(String(length=255), primary_key=True)
+    digest: Mapped[str] = mapped_column(String(length=64), nullable=False, index=True)
+    refcount: Mapped[int] = mapped_column(nullable=False, default=0)
+    updated: Mapped[datetime] = mapped_column(default=datetime.utcnow, index=True)
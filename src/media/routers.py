@@ -2,10 +2,29 @@
 Media routers
 """
 
+import mimetypes
 import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Literal
+from urllib.parse import quote
 
-from fastapi import APIRouter, HTTPException
+import aiofiles.os
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.responses import FileResponse
+from PIL import UnidentifiedImageError
+
+from src.environs import (
+    MEDIA_ROOT,
+    MEDIA_MAX_DIMENSION,
+    MEDIA_CACHE_CONTROL,
+    MEDIA_ACCEL_REDIRECT,
+    MEDIA_ACCEL_PREFIX,
+    MEDIA_DERIVATIVES_ROOT,
+    MEDIA_DERIVATIVES_ACCEL_PREFIX,
+)
+
+from .images import InvalidImageError, derivative_cache
 
 
 router = APIRouter(
@@ -14,9 +33,99 @@ router = APIRouter(
 )
 
 
-@router.get("/{file_path:path}", response_class=FileResponse)
-async def get_media(file_path: str) -> FileResponse:
-    file = os.path.join(file_path)
-    if not os.path.isfile(file):
+def resolve_media_path(file_path: str) -> str:
+    """
+    Normalizes a requested path and keeps it inside MEDIA_ROOT
+    """
+    path = os.path.normpath(file_path)
+    if os.path.isabs(path) or not path.startswith(os.path.normpath(MEDIA_ROOT) + os.sep):
+        raise HTTPException(status_code=404, detail="File not found")
+    return path
+
+
+async def stat_file(path: str) -> os.stat_result:
+    try:
+        stat_result = await aiofiles.os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat.S_ISREG(stat_result.st_mode):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(path=file)
+    return stat_result
+
+
+def make_etag(stat_result: os.stat_result) -> str:
+    """
+    Strong validator in the nginx format, so both layers agree on it
+    """
+    return f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"'
+
+
+def is_not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(stat_result.st_mtime) <= since
+    return False
+
+
+async def send_file(request: Request, path: str, root: str, accel_prefix: str) -> Response:
+    """
+    Sends a file with ETag/Last-Modified validators, answering 304 when the
+    client copy is fresh. Range requests are served by FileResponse, or by
+    nginx when X-Accel-Redirect offload is enabled
+    """
+    stat_result = await stat_file(path)
+    etag = make_etag(stat_result)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": MEDIA_CACHE_CONTROL,
+    }
+
+    if is_not_modified(request, etag, stat_result):
+        return Response(status_code=304, headers=headers)
+
+    if MEDIA_ACCEL_REDIRECT:
+        headers["X-Accel-Redirect"] = accel_prefix + quote(os.path.relpath(path, root))
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return Response(headers=headers, media_type=media_type)
+
+    return FileResponse(path=path, headers=headers, stat_result=stat_result)
+
+
+@router.get("/{file_path:path}", response_class=FileResponse)
+async def get_media(
+    request:   Request,
+    file_path: str,
+    width:     int | None = Query(default=None, ge=1, le=MEDIA_MAX_DIMENSION),
+    height:    int | None = Query(default=None, ge=1, le=MEDIA_MAX_DIMENSION),
+    format:    Literal["webp", "jpeg"] | None = None,
+    quality:   int = Query(default=80, ge=1, le=100),
+) -> Response:
+    file = resolve_media_path(file_path)
+
+    if width is None and height is None and format is None:
+        return await send_file(request, file, MEDIA_ROOT, MEDIA_ACCEL_PREFIX)
+
+    await stat_file(file)
+    try:
+        derivative = await derivative_cache.get(
+            source=file,
+            width=width,
+            height=height,
+            image_format=format or "webp",
+            quality=quality,
+        )
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=415, detail="File is not an image")
+    except InvalidImageError:
+        raise HTTPException(status_code=422, detail="Image can not be decoded")
+    return await send_file(request, derivative, MEDIA_DERIVATIVES_ROOT, MEDIA_DERIVATIVES_ACCEL_PREFIX)
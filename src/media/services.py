@@ -0,0 +1,159 @@
+"""
+Services module contains business logic
+"""
+
+import logging
+import os
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable
+
+import aiofiles.os
+from sqlalchemy import Integer, String, column, delete, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import async_session
+from src.environs import MEDIA_STORAGE, MEDIA_BLOB_ROOT, MEDIA_BLOB_GRACE_SECONDS
+
+from .models import MediaBlob
+
+
+logger = logging.getLogger(__name__)
+
+# Extension kept in a blob name, anything else is dropped when the path is built
+BLOB_EXTENSION = re.compile(r"\.[a-z0-9]{1,10}")
+# blobs/ab/cd/abcd<60 more hex digits>.ext, the only paths that are counted and deleted
+BLOB_PATH = re.compile(
+    re.escape(MEDIA_BLOB_ROOT) + r"/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(?:" + BLOB_EXTENSION.pattern + ")?"
+)
+
+
+class MediaBlobService():
+    """
+    Reference counting for content-addressed blobs.
+    Paths outside MEDIA_BLOB_ROOT (filename storage) are ignored
+    """
+
+    @staticmethod
+    def is_blob_path(path: str) -> bool:
+        return BLOB_PATH.fullmatch(path) is not None
+
+
+    @classmethod
+    def blob_paths(cls, paths: Iterable[str | None] | None) -> list[str]:
+        """
+        Paths in the sharded blob layout. Anything else, e.g. a client path with `..`,
+        is never counted, so it can not reach collect_garbage
+        """
+        return [path for path in paths or [] if path and cls.is_blob_path(path)]
+
+
+    @classmethod
+    async def registered(cls, db: AsyncSession, paths: Iterable[str]) -> set[str]:
+        """
+        The given paths that have a media_blob row, i.e. were stored by an upload
+        """
+        paths = set(paths)
+        if not paths:
+            return set()
+        query = select(MediaBlob.path).where(MediaBlob.path.in_(paths))
+        return set((await db.execute(query)).scalars().all())
+
+
+    @classmethod
+    async def register(cls, path: str) -> None:
+        """
+        Records a blob that is about to be written or reused, without a reference.
+        Runs in its own committed transaction: a blob of a request that fails
+        later is still known to collect_garbage, and the fresh `updated`
+        keeps a reused blob alive for the grace period until acquire runs
+        """
+        digest = os.path.splitext(os.path.basename(path))[0]
+        now = datetime.utcnow()
+        async with async_session() as db:
+            query = insert(MediaBlob).values(path=path, digest=digest, refcount=0, updated=now)
+            query = query.on_conflict_do_update(index_elements=[MediaBlob.path], set_={"updated": now})
+            await db.execute(query)
+            await db.commit()
+
+
+    @classmethod
+    async def acquire(
+        cls,
+        db: AsyncSession,
+        paths: Iterable[str | None] | None,
+    ) -> set[str]:
+        """
+        Adds one reference per path in a single statement. Only blobs registered
+        by an upload are counted; returns the paths that were.
+        Does not commit, so the counts change in the same transaction as the news rows
+        """
+        counts = Counter(cls.blob_paths(paths))
+        if not counts:
+            return set()
+        rows = values(column("path", String), column("count", Integer), name="acquired").data(sorted(counts.items()))
+        query = (
+            update(MediaBlob)
+            .where(MediaBlob.path == rows.c.path)
+            .values(refcount=MediaBlob.refcount + rows.c.count, updated=datetime.utcnow())
+            .returning(MediaBlob.path)
+            .execution_options(synchronize_session=False)
+        )
+        return set((await db.execute(query)).scalars().all())
+
+
+    @classmethod
+    async def release(
+        cls,
+        db: AsyncSession,
+        paths: Iterable[str | None] | None,
+    ) -> None:
+        """
+        Drops one reference per path. Unreferenced blobs are removed by collect_garbage
+        """
+        for path in cls.blob_paths(paths):
+            query = (
+                update(MediaBlob)
+                .where(MediaBlob.path == path)
+                .values(refcount=MediaBlob.refcount - 1, updated=datetime.utcnow())
+            )
+            await db.execute(query)
+
+
+    @classmethod
+    async def collect_garbage(
+        cls,
+        db: AsyncSession,
+        grace_seconds: int = MEDIA_BLOB_GRACE_SECONDS,
+    ) -> int:
+        """
+        Deletes blobs that have been unreferenced for longer than the grace period.
+        The grace period covers uploads that reused a blob but are not committed yet.
+        Files are removed before the commit: the deleted rows stay locked until then,
+        so a concurrent register of the same path waits and then sees the file gone
+        """
+        threshold = datetime.utcnow() - timedelta(seconds=grace_seconds)
+        query = (
+            delete(MediaBlob)
+            .where(MediaBlob.refcount <= 0, MediaBlob.updated < threshold)
+            .returning(MediaBlob.path)
+        )
+        paths = (await db.execute(query)).scalars().all()
+
+        for path in paths:
+            if not cls.is_blob_path(path):
+                logger.warning("Skipping removal of %s, not a blob path", path)
+                continue
+            try:
+                await aiofiles.os.remove(path)
+            except FileNotFoundError:
+                pass
+        await db.commit()
+        return len(paths)
+
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return MEDIA_STORAGE == "hash"
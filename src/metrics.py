@@ -0,0 +1,188 @@
+"""
+Prometheus metrics.
+
+With PROMETHEUS_MULTIPROC_DIR set, every worker process writes its samples
+to that directory and /metrics aggregates all of them
+"""
+
+import os
+import time
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .query_budget import record_query
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+db_pool_checkout_seconds = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    buckets=LATENCY_BUCKETS,
+)
+db_pool_connection_held_seconds = Histogram(
+    "db_pool_connection_held_seconds",
+    "Time a connection stays checked out of the SQLAlchemy pool",
+    buckets=LATENCY_BUCKETS,
+)
+db_pool_connections_checked_out = Gauge(
+    "db_pool_connections_checked_out",
+    "Connections currently checked out of the SQLAlchemy pools",
+    multiprocess_mode="livesum",
+)
+db_pool_checkout_timeouts = Counter(
+    "db_pool_checkout_timeouts",
+    "Pool checkouts that failed because the pool was exhausted",
+)
+
+http_request_seconds = Histogram(
+    "http_request_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+db_query_seconds = Histogram(
+    "db_query_seconds",
+    "SQL statement execution time by statement type",
+    ["statement"],
+    buckets=LATENCY_BUCKETS,
+)
+db_query_errors = Counter(
+    "db_query_errors",
+    "SQL statements that raised an error",
+    ["statement"],
+)
+
+cache_requests = Counter(
+    "cache_requests",
+    "Response cache lookups by namespace and result (HIT, MISS, BYPASS)",
+    ["namespace", "result"],
+)
+
+redis_command_seconds = Histogram(
+    "redis_command_seconds",
+    "Redis command latency",
+    ["command"],
+    buckets=LATENCY_BUCKETS,
+)
+
+celery_enqueue_seconds = Histogram(
+    "celery_enqueue_seconds",
+    "Time spent publishing a Celery task to the broker",
+    ["task"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def statement_type(statement: str) -> str:
+    """
+    First keyword of a SQL statement, used as a low-cardinality label
+    """
+    keyword = statement.lstrip().split(None, 1)[0] if statement.strip() else ""
+    return keyword.upper() or "UNKNOWN"
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Times every statement of a (sync) engine through cursor execution events
+    and tracks pool usage through the checkout/checkin pool events
+    """
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        db_pool_connections_checked_out.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            db_pool_connections_checked_out.dec()
+            db_pool_connection_held_seconds.observe(time.perf_counter() - checked_out_at)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        db_query_seconds.labels(statement_type(statement)).observe(duration)
+        record_query(statement, duration)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        stack = context.connection.info.get("query_started") if context.connection else None
+        if stack:
+            stack.pop()
+        db_query_errors.labels(statement_type(context.statement or "")).inc()
+
+
+class PrometheusMiddleware():
+    """
+    ASGI middleware recording per-route latency and in-flight requests.
+    Routes are labelled by their template, so path ids do not blow up cardinality
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = http_requests_in_flight.labels(method)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            http_request_seconds.labels(
+                method, getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
+
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """
+    Metrics in the Prometheus text format
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
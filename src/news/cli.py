@@ -0,0 +1,52 @@
+"""
+News command line tools
+
+    python -m src.news.cli ingest feed.ndjson --batch-size 5000
+"""
+
+import argparse
+import asyncio
+import json
+
+import aiofiles
+
+from src.database import async_session, engine
+from src.environs import NEWS_INGEST_BATCH_SIZE
+
+from .services import NewsIngestService, iter_lines
+
+
+async def read_chunks(path: str, chunk_size: int = 1024 * 1024):
+    async with aiofiles.open(path, mode="rb") as file:
+        while chunk := await file.read(chunk_size):
+            yield chunk
+
+
+async def ingest(path: str, batch_size: int) -> None:
+    try:
+        async with async_session() as db:
+            result = await NewsIngestService.ingest(
+                db=db,
+                lines=iter_lines(read_chunks(path)),
+                batch_size=batch_size,
+            )
+    finally:
+        await engine.dispose()
+    print(json.dumps(result.model_dump(), ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.news.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Bulk insert news from an NDJSON file")
+    ingest_parser.add_argument("path")
+    ingest_parser.add_argument("--batch-size", type=int, default=NEWS_INGEST_BATCH_SIZE)
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        asyncio.run(ingest(args.path, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
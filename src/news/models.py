@@ -5,12 +5,31 @@ SQLalchemy ORM models
 from uuid import UUID
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, String, ARRAY
+from sqlalchemy import BigInteger, ForeignKey, String, ARRAY, Index, func, literal_column
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
 from src.users.models import User
 
+
+# Text search configuration of the news search index
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def news_search_vector(title, content):
+    """
+    Weighted tsvector over news title (A) and content (B).
+    Queries must use this exact expression to hit ix_news_search_vector
+    """
+    return func.setweight(
+        func.to_tsvector(SEARCH_CONFIG, func.coalesce(title, literal_column("''"))), literal_column("'A'")
+    ).op("||")(
+        func.setweight(
+            func.to_tsvector(SEARCH_CONFIG, func.coalesce(content, literal_column("''"))), literal_column("'B'")
+        )
+    )
+
+
 class Category(Base):
     """
     Category model
@@ -28,13 +47,19 @@ class News(Base):
     News model
     """
     __tablename__ = "news"
+    __table_args__ = (
+        Index("ix_news_created_id", "created", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String(length=100), nullable=False)
     content: Mapped[str | None] = mapped_column(nullable=True)
     images: Mapped[list[str | None]] = mapped_column(ARRAY(String), nullable=True)
     created: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    updated: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    updated: Mapped[datetime] = mapped_column(default=datetime.utcnow, onupdate=datetime.utcnow)
+    comments_count: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False)
+    # flushed from the Redis view counters by tasks.flush_news_views
+    views: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
 
     category_id: Mapped[int | None] = mapped_column(
         ForeignKey("category.id", ondelete="SET NULL"), nullable=True
@@ -44,16 +69,26 @@ class News(Base):
     comments: Mapped[list["Comment"]] = relationship("Comment", back_populates="news")
 
 
+Index(
+    "ix_news_search_vector",
+    news_search_vector(News.title, News.content),
+    postgresql_using="gin",
+)
+
+
 class Comment(Base):
     """
     Comment model
     """
     __tablename__ = "comment"
+    __table_args__ = (
+        Index("ix_comment_news_id_created_id", "news_id", "created", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     text: Mapped[str] = mapped_column(String(500), nullable=False)
     created: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    updated: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    updated: Mapped[datetime] = mapped_column(default=datetime.utcnow, onupdate=datetime.utcnow)
 
     news_id: Mapped[int] = mapped_column(
         ForeignKey("news.id", ondelete="CASCADE")
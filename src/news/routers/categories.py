@@ -4,13 +4,16 @@ Categories Router
 
 from typing import Sequence, Annotated
 
-from fastapi import APIRouter, Depends, Form
+from fastapi import APIRouter, Depends, Form, Request, Response
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import Category
 from ..schemas import CategoryReadSchema
 from ..services import CategoryService
-from src import get_db
+from src import get_db, get_read_db
+from src.cache import CachedResponse, response_cache, serialize
+from src.pagination import next_cursor_headers
 
 
 router = APIRouter(
@@ -18,34 +21,56 @@ router = APIRouter(
     tags=["Categories"]
 )
 
+category_list_adapter = TypeAdapter(list[CategoryReadSchema])
+category_adapter = TypeAdapter(CategoryReadSchema)
+
 
 @router.get("", response_model=Sequence[CategoryReadSchema])
 async def get_categories(
+    request: Request,
     offset: int = 0, 
     limit:  int = 10, 
-    db:     AsyncSession = Depends(get_db)
-) -> Sequence[Category]:
+    cursor: str | None = None,
+    db:     AsyncSession = Depends(get_read_db)
+) -> Response:
     """
     Get all categories
     """
-    return await CategoryService.get_categories(
-        db=db, 
-        offset=offset, 
-        limit=limit
+    async def load() -> CachedResponse:
+        categories, next_cursor = await CategoryService.get_categories(
+            db=db, 
+            offset=offset, 
+            limit=limit,
+            cursor=cursor
+        )
+        return serialize(category_list_adapter, categories, headers=next_cursor_headers(next_cursor))
+
+    return await response_cache.fetch(
+        key=response_cache.key("categories", offset, limit, cursor or ""),
+        tags=["categories"],
+        loader=load,
+        request=request,
     )
 
 
 @router.get("/{category_id}", response_model=CategoryReadSchema)
 async def get_category(
     category_id: int, 
-    db:          AsyncSession = Depends(get_db)
-) -> Category:
+    request:     Request,
+    db:          AsyncSession = Depends(get_read_db)
+) -> Response:
     """
     Get category by id
     """
-    return await CategoryService.get_category(
-        db=db, 
-        category_id=category_id
+    async def load() -> CachedResponse:
+        category = await CategoryService.get_category(db=db, category_id=category_id)
+        return serialize(category_adapter, category)
+
+    return await response_cache.fetch(
+        key=response_cache.key("categories", "detail", category_id),
+        tags=["categories"],
+        loader=load,
+        request=request,
     )
 
 
@@ -1,12 +1,15 @@
-from typing import Sequence, List
+from typing import Annotated, Sequence, List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from fastapi_users.authentication import Authenticator
+from pydantic import TypeAdapter
 
 from src.users import User, fastapi_users
-from src import get_db
+from src import get_db, get_read_db
+from src.pagination import next_cursor_headers
+from src.responses import json_response
 from ..models import Comment
 from ..schemas import CommentReadSchema, CommentCreateSchema
 from ..services import CommentService
@@ -16,22 +19,42 @@ router = APIRouter(
     tags=["Comments"]
 )
 
+comment_list_adapter = TypeAdapter(List[CommentReadSchema])
+top_comments_adapter = TypeAdapter(dict[int, List[CommentReadSchema]])
+
+
+
+@router.get("/batch", response_model=dict[int, List[CommentReadSchema]])
+async def get_top_comments(
+    news_ids: Annotated[list[int], Query(min_length=1, max_length=100)],
+    per_news: Annotated[int, Query(ge=1, le=20)] = 3,
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Newest comments for many news in one round trip, keyed by news id
+    """
+    comments = await CommentService.get_top_comments(db=db, news_ids=news_ids, per_news=per_news)
+    return json_response(top_comments_adapter, comments)
 
 
 @router.get("/{news_id}", response_model=List[CommentReadSchema])
 async def get_comments(
     news_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     offset: int = 0,
     limit: int = 10,
-) -> Sequence[Comment]:
-    return await CommentService.get_comments(db=db, news_id=news_id, offset=offset, limit=limit)
+    cursor: str | None = None,
+) -> Response:
+    comments, next_cursor = await CommentService.get_comments(
+        db=db, news_id=news_id, offset=offset, limit=limit, cursor=cursor
+    )
+    return json_response(comment_list_adapter, comments, headers=next_cursor_headers(next_cursor))
 
 
 @router.get("/{comment_id}", response_model=CommentReadSchema)
 async def get_comment(
     comment_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ) -> Comment:
     return await CommentService.get_comment(db=db, comment_id=comment_id)
 
@@ -2,15 +2,28 @@
 News Router
 """
 
+from datetime import datetime
 from typing import Sequence, Annotated
 
-from fastapi import APIRouter, Depends, Form, File, UploadFile
+from fastapi import APIRouter, Depends, Form, File, UploadFile, Query, Request, Response
+from starlette.background import BackgroundTask
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
-
-from ..services import NewsService
-from ..schemas import NewsReadSchema, NewsReadDetailsSchema
+from src.database import get_db, get_read_db
+from src.environs import NEWS_INGEST_BATCH_SIZE
+from src.cache import CachedResponse, response_cache, serialize
+from src.pagination import next_cursor_headers
+from src.responses import json_response
+
+from ..services import NewsService, NewsIngestService, NewsViewService, iter_lines
+from ..schemas import (
+    NewsReadSchema,
+    NewsReadDetailsSchema,
+    NewsSearchResultSchema,
+    NewsRankingSchema,
+    NewsIngestResultSchema,
+)
 from ..models import News
 
 router = APIRouter(
@@ -18,21 +31,106 @@ router = APIRouter(
     tags=["News"]
 )
 
+news_list_adapter = TypeAdapter(list[NewsReadSchema])
+news_details_adapter = TypeAdapter(NewsReadDetailsSchema)
+news_search_adapter = TypeAdapter(list[NewsSearchResultSchema])
+news_ranking_adapter = TypeAdapter(list[NewsRankingSchema])
+
 
 @router.get("", response_model=Sequence[NewsReadSchema])
-async def get_news(offset: int = 0, limit: int = 10, db: AsyncSession = Depends(get_db)) -> Sequence[News]:
+async def get_news(
+    request:        Request,
+    offset:         int = 0,
+    limit:          int = 10,
+    cursor:         str | None = None,
+    db:             AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Get all news, newest first.
+    Pass the X-Next-Cursor header value as `cursor` to fetch the next page
+    """
+    async def load() -> CachedResponse:
+        news, next_cursor = await NewsService.get_news(db=db, offset=offset, limit=limit, cursor=cursor)
+        return serialize(news_list_adapter, news, headers=next_cursor_headers(next_cursor))
+
+    return await response_cache.fetch(
+        key=response_cache.key("news:list", offset, limit, cursor or ""),
+        tags=["news:list"],
+        loader=load,
+        request=request,
+    )
+
+
+@router.get("/search", response_model=list[NewsSearchResultSchema])
+async def search_news(
+    q:              Annotated[str, Query(min_length=1, max_length=200)],
+    category_id:    int | None = None,
+    date_from:      datetime | None = None,
+    date_to:        datetime | None = None,
+    limit:          Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor:         str | None = None,
+    db:             AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Full-text search over news, ranked and highlighted.
+    Pass the X-Next-Cursor header value as `cursor` to fetch the next page
+    """
+    results, next_cursor = await NewsService.search_news(
+        db=db,
+        query=q,
+        category_id=category_id,
+        date_from=date_from,
+        date_to=date_to,
+        limit=limit,
+        cursor=cursor,
+    )
+    return json_response(news_search_adapter, results, headers=next_cursor_headers(next_cursor))
+
+
+@router.get("/trending", response_model=list[NewsRankingSchema])
+async def get_trending_news(
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
     """
-    Get all news
+    Most viewed news recently, views lose half their weight every NEWS_TRENDING_HALF_LIFE.
+    Served from Redis, the database is read for summaries not cached yet;
+    while Redis is unavailable the news with most views are returned
     """
-    return await NewsService.get_news(db=db, offset=offset, limit=limit)
+    return json_response(news_ranking_adapter, await NewsViewService.get_trending(db=db, limit=limit))
+
+
+@router.get("/popular", response_model=list[NewsRankingSchema])
+async def get_popular_news(
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    db: AsyncSession = Depends(get_read_db),
+) -> Response:
+    """
+    Most viewed news of all time, scored by News.views plus the views not flushed yet.
+    Served from Redis, from the news table while Redis is unavailable
+    """
+    return json_response(news_ranking_adapter, await NewsViewService.get_popular(db=db, limit=limit))
 
 
 @router.get("/{news_id}", response_model=NewsReadDetailsSchema)
-async def get_news_object(news_id: int, db: AsyncSession = Depends(get_db)) -> News:
+async def get_news_object(news_id: int, request: Request, db: AsyncSession = Depends(get_read_db)) -> Response:
     """
     Get news by id
     """
-    return await NewsService.get_news_object(db=db, news_id=news_id)
+    async def load() -> CachedResponse:
+        news = await NewsService.get_news_object(db=db, news_id=news_id)
+        return serialize(news_details_adapter, news)
+
+    response = await response_cache.fetch(
+        key=response_cache.key("news:detail", news_id),
+        tags=["news:detail", f"news:{news_id}"],
+        loader=load,
+        request=request,
+    )
+    if response.status_code == 200:
+        # counted after the response is sent, revalidations (304) are not views
+        response.background = BackgroundTask(NewsViewService.record_view, news_id)
+    return response
 
 
 @router.post("", response_model=NewsReadSchema)
@@ -55,6 +153,23 @@ async def create_news_object(
     )
 
 
+@router.post("/bulk", response_model=NewsIngestResultSchema)
+async def ingest_news(
+    request:        Request,
+    batch_size:     Annotated[int, Query(ge=1, le=50000)] = NEWS_INGEST_BATCH_SIZE,
+    db:             AsyncSession = Depends(get_db),
+) -> NewsIngestResultSchema:
+    """
+    Bulk news ingestion from an NDJSON body, one news object per line.
+    Rows with errors are reported by line number and skipped
+    """
+    return await NewsIngestService.ingest(
+        db=db,
+        lines=iter_lines(request.stream()),
+        batch_size=batch_size,
+    )
+
+
 @router.put("/{news_id}", response_model=NewsReadSchema)
 async def update_news(
     news_id:        int,
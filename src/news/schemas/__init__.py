@@ -1,3 +1,12 @@
 from .categories import CategoryReadSchema
-from .news import NewsReadSchema, NewsReadDetailsSchema
+from .news import (
+    NewsReadSchema,
+    NewsReadDetailsSchema,
+    NewsSearchResultSchema,
+    NewsSummarySchema,
+    NewsRankingSchema,
+    NewsIngestSchema,
+    NewsIngestErrorSchema,
+    NewsIngestResultSchema,
+)
 from .comments import CommentReadSchema, CommentCreateSchema
@@ -4,7 +4,7 @@ Pydantic schemas for News
 
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from .categories import CategoryReadSchema
 from .comments import CommentReadSchema
@@ -28,6 +28,66 @@ class NewsReadSchema(BaseModel):
 class NewsReadDetailsSchema(NewsReadSchema):
     """
     News read schema with detailed category data
+    and the newest comments; the full thread is served by /comments/{news_id}
     """
     category: CategoryReadSchema | None = None
-    comments: list[CommentReadSchema]
\ No newline at end of file
+    comments_count: int = 0
+    comments: list[CommentReadSchema]
+
+
+class NewsSearchResultSchema(NewsReadSchema):
+    """
+    News search result with rank and highlighted fragments
+    """
+    rank: float
+    title_highlight: str
+    content_highlight: str | None = None
+
+
+class NewsSummarySchema(BaseModel):
+    """
+    News without its content, kept in Redis for the ranking endpoints
+    """
+    id: int
+    title: str
+    images: list[str | None]
+    created: datetime
+    updated: datetime
+    category_id: int | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class NewsRankingSchema(NewsSummarySchema):
+    """
+    Trending or popular news with its ranking score
+    """
+    score: float
+
+
+class NewsIngestSchema(BaseModel):
+    """
+    One NDJSON line of the bulk ingestion payload
+    """
+    title: str = Field(max_length=100)
+    content: str | None = None
+    images: list[str] = []
+    category_id: int | None = None
+    created: datetime | None = None
+
+
+class NewsIngestErrorSchema(BaseModel):
+    """
+    Rejected line of the bulk ingestion payload
+    """
+    line: int
+    error: str
+
+
+class NewsIngestResultSchema(BaseModel):
+    """
+    Bulk ingestion report
+    """
+    inserted: int = 0
+    errors: list[NewsIngestErrorSchema] = []
@@ -1,3 +1,6 @@
 from .categories import CategoryService
+from .category_cache import category_cache
 from .news import NewsService
-from .comments import CommentService
\ No newline at end of file
+from .comments import CommentService
+from .ingest import NewsIngestService, iter_lines
+from .views import NewsViewService
@@ -8,7 +8,10 @@ from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import Category
-from src import DBManager
+from .category_cache import category_cache
+from .views import NewsViewService
+from src import DBManager, response_cache
+from src.pagination import next_cursor_for
 
 
 class CategoryService():
@@ -19,11 +22,15 @@ class CategoryService():
         db: AsyncSession,
         offset: int = 0,
         limit: int = 10,
-    ) -> Sequence[Category]:
+        cursor: str | None = None,
+    ) -> tuple[Sequence[Category], str | None]:
         """
         Service
         """
-        return await DBManager.get_objects(db, model=Category, offset=offset, limit=limit)
+        categories = await category_cache.page(offset=offset, limit=limit, cursor=cursor)
+        if categories is not None:
+            return categories, next_cursor_for(categories, limit)
+        return await DBManager.get_page(db, model=Category, offset=offset, limit=limit, cursor=cursor)
 
 
     @classmethod
@@ -35,7 +42,12 @@ class CategoryService():
         """
         Service
         """
-        category = await DBManager.get_object(db=db, model=Category, field="id", value=category_id)
+        category = await category_cache.get(category_id)
+        if not category:
+            # a miss is confirmed by the database: the copy may predate a create of another worker
+            category = await DBManager.get_object(db=db, model=Category, field="id", value=category_id)
+            if category is not None:
+                category_cache.expire()
         if category is None:
             raise HTTPException(status_code=404, detail="Category not found")
         return category
@@ -50,7 +62,10 @@ class CategoryService():
         """
         Service
         """
-        return await DBManager.create_object(**category, db=db, model=Category, commit=True)
+        category = await DBManager.create_object(**category, db=db, model=Category, commit=True)
+        await category_cache.invalidate()
+        await response_cache.invalidate("categories")
+        return category
 
 
     @classmethod
@@ -63,6 +78,10 @@ class CategoryService():
         Service
         """
         await DBManager.delete_object(db=db, model=Category, field="id", value=category_id, commit=True)
+        await category_cache.invalidate()
+        # news rows lose their category_id through ON DELETE SET NULL
+        await response_cache.invalidate("categories", "news:list", "news:detail")
+        await NewsViewService.forget_summaries()
 
 
     @classmethod
@@ -83,4 +102,7 @@ class CategoryService():
 
         if category is None:
             raise HTTPException(status_code=404, detail="Category not found")
+
+        await category_cache.invalidate()
+        await response_cache.invalidate("categories", "news:detail")
         return category
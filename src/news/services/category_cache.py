@@ -0,0 +1,190 @@
+"""
+In-process copy of the category table
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from ..models import Category
+from src import DBManager, async_session, redis_client, CATEGORY_CACHE_ENABLED, CATEGORY_CACHE_REVALIDATE_SECONDS
+from src.pagination import decode_cursor
+
+
+logger = logging.getLogger(__name__)
+
+
+class CategoryCache():
+    """
+    Every worker keeps all categories in memory, so lookups cost no round trip.
+    Writes bump a version in Redis and announce it on a pub/sub channel,
+    which makes every worker drop its copy. A copy older than
+    revalidate_seconds compares its version with Redis, in case
+    an announcement was lost while the subscription was down
+    """
+
+    def __init__(
+        self,
+        prefix: str = "categories",
+        revalidate_seconds: float = CATEGORY_CACHE_REVALIDATE_SECONDS,
+        enabled: bool = CATEGORY_CACHE_ENABLED,
+    ) -> None:
+        self.version_key = f"{prefix}:version"
+        self.channel = f"{prefix}:invalidate"
+        self.revalidate_seconds = revalidate_seconds
+        self.enabled = enabled
+        self._rows: list[dict[str, Any]] | None = None
+        self._by_id: dict[int, dict[str, Any]] = {}
+        self._version: bytes | None = None
+        self._checked_at = 0.0
+        # bumped by every invalidation, a load that raced with one is discarded
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._listener: asyncio.Task | None = None
+
+
+    async def rows(self) -> list[dict[str, Any]] | None:
+        """
+        All categories newest first, or None when the cache can not be used
+        """
+        if not self.enabled:
+            return None
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+        if self._rows is not None and time.monotonic() - self._checked_at > self.revalidate_seconds:
+            await self._revalidate()
+        if self._rows is None:
+            async with self._lock:
+                if self._rows is None:
+                    await self._load()
+        return self._rows
+
+
+    async def get(self, category_id: int) -> Category | None | bool:
+        """
+        Category by id, None when it does not exist and False when the cache is unavailable
+        """
+        if await self.rows() is None:
+            return False
+        row = self._by_id.get(category_id)
+        return DBManager.from_row(Category, row) if row is not None else None
+
+
+    async def page(self, offset: int = 0, limit: int = 10, cursor: str | None = None) -> list[Category] | None:
+        """
+        Same ordering and keyset semantics as DBManager.get_objects
+        """
+        rows = await self.rows()
+        if rows is None:
+            return None
+        if cursor:
+            after = decode_cursor(cursor)
+            rows = [row for row in rows if (row["created"], row["id"]) < after]
+        elif offset:
+            rows = rows[offset:]
+        return [DBManager.from_row(Category, row) for row in rows[:limit]]
+
+
+    async def invalidate(self) -> None:
+        """
+        Called after a committed category write
+        """
+        self._drop()
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.incr(self.version_key)
+                pipe.publish(self.channel, b"")
+                await pipe.execute()
+        except RedisError:
+            logger.exception("Category cache invalidation failed")
+
+
+    def expire(self) -> None:
+        """
+        Drops the copy of this worker only, e.g. when it missed a row that exists
+        """
+        self._drop()
+
+
+    def _drop(self) -> None:
+        self._generation += 1
+        self._rows = None
+        self._by_id = {}
+
+
+    async def _load(self) -> None:
+        generation = self._generation
+        try:
+            # read before the table, so a concurrent write always leaves a newer version
+            version = await redis_client.get(self.version_key)
+        except RedisError:
+            logger.exception("Category cache version read failed")
+            return
+
+        # always the primary: a lagging replica would pin stale rows until the next write
+        async with async_session() as db:
+            query = select(Category).order_by(Category.created.desc(), Category.id.desc())
+            categories = (await db.execute(query)).scalars().all()
+            rows = [{column.key: getattr(category, column.key) for column in Category.__table__.columns} for category in categories]
+
+        if generation != self._generation:
+            return
+        self._rows = rows
+        self._by_id = {row["id"]: row for row in rows}
+        self._version = version
+        self._checked_at = time.monotonic()
+
+
+    async def _revalidate(self) -> None:
+        try:
+            version = await redis_client.get(self.version_key)
+        except RedisError:
+            logger.exception("Category cache version read failed")
+            self._drop()
+            return
+        if version != self._version:
+            self._drop()
+        else:
+            self._checked_at = time.monotonic()
+
+
+    async def _listen(self) -> None:
+        delay = 0.5
+        reconnecting = False
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                if reconnecting:
+                    # announcements may have been missed while not subscribed
+                    self._drop()
+                    reconnecting = False
+                delay = 0.5
+                async for _ in pubsub.listen():
+                    self._drop()
+            except (RedisError, OSError):
+                logger.exception("Category cache subscription lost, reconnecting in %ss", delay)
+                self._drop()
+                reconnecting = True
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+category_cache = CategoryCache()
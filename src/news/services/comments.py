@@ -1,14 +1,29 @@
 from typing import Sequence
 
 from fastapi import HTTPException
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from src import DBManager
+from src import DBManager, response_cache
+from src.realtime import event_broker
 from src.users.models import User
 from ..models import Comment, News
+from ..schemas import CommentReadSchema
 
 
 class CommentService:
+    @classmethod
+    async def _publish(cls, event: str, comment: Comment, news_ids: set[int] | None = None) -> None:
+        """
+        Pushes a comment event to the subscribers of the news thread
+        """
+        data = CommentReadSchema.model_validate(comment).model_dump(mode="json")
+        data["news_id"] = comment.news_id
+        channels = [f"comments:{news_id}" for news_id in news_ids or {comment.news_id}]
+        await event_broker.publish(event, data, channels)
+
     @classmethod
     async def get_comments(
         cls,
@@ -16,18 +31,52 @@ class CommentService:
         news_id: int,
         offset: int = 0,
         limit: int = 10,
-    ) -> Sequence[Comment]:
+        cursor: str | None = None,
+    ) -> tuple[Sequence[Comment], str | None]:
         """
         Получить комментарии для конкретной новости.
         """
-        return await DBManager.get_objects(
+        return await DBManager.get_page(
             db=db,
             model=Comment,
             offset=offset,
             limit=limit,
+            cursor=cursor,
             filters={"news_id": news_id}
         )
 
+    @classmethod
+    async def get_top_comments(
+        cls,
+        db: AsyncSession,
+        news_ids: Sequence[int],
+        per_news: int = 3,
+    ) -> dict[int, list[Comment]]:
+        """
+        Получить последние комментарии сразу для нескольких новостей
+        одним запросом (ROW_NUMBER по news_id).
+        """
+        position = func.row_number().over(
+            partition_by=Comment.news_id,
+            order_by=(Comment.created.desc(), Comment.id.desc()),
+        ).label("position")
+        ranked = (
+            select(Comment, position)
+            .where(Comment.news_id.in_(set(news_ids)))
+            .subquery()
+        )
+        ranked_comment = aliased(Comment, ranked)
+        query = (
+            select(ranked_comment)
+            .where(ranked.c.position <= per_news)
+            .order_by(ranked.c.news_id, ranked.c.position)
+        )
+
+        comments: dict[int, list[Comment]] = {news_id: [] for news_id in news_ids}
+        for comment in (await db.execute(query)).scalars():
+            comments[comment.news_id].append(comment)
+        return comments
+
     @classmethod
     async def get_comment(
         cls,
@@ -47,6 +96,69 @@ class CommentService:
             raise HTTPException(status_code=404, detail="Comment not found")
         return comment
 
+    @classmethod
+    async def _check_owner(
+        cls,
+        db: AsyncSession,
+        comment_id: int,
+    ) -> None:
+        """
+        Explains why an ownership-filtered write matched no rows
+        """
+        if await DBManager.exists(db, Comment, "id", comment_id):
+            raise HTTPException(status_code=403, detail="You do not have permission to update this comment")
+        raise HTTPException(status_code=404, detail="Comment not found")
+
+    @classmethod
+    async def _update_owned(
+        cls,
+        db: AsyncSession,
+        comment_id: int,
+        values: dict,
+        user: User,
+    ) -> Comment:
+        """
+        Updates a comment of the user with one UPDATE ... RETURNING.
+        The self-join returns the previous news_id, so moving a comment
+        between news keeps both comments_count counters right
+        """
+        if not values:
+            comment = await DBManager.update_object(
+                db=db, model=Comment, field="id", value=comment_id, filters={"user_id": user.id}
+            )
+            if comment is None:
+                await cls._check_owner(db, comment_id)
+            return comment
+
+        previous = Comment.__table__.alias("previous")
+        query = (
+            update(Comment)
+            .where(Comment.id == comment_id, Comment.user_id == user.id, previous.c.id == Comment.id)
+            .values(**values)
+            .returning(*Comment.__table__.columns, previous.c.news_id.label("previous_news_id"))
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            row = (await db.execute(query)).mappings().one_or_none()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="News not found")
+
+        if row is None:
+            await cls._check_owner(db, comment_id)
+
+        row = dict(row)
+        previous_news_id = row.pop("previous_news_id")
+        if previous_news_id != row["news_id"]:
+            await DBManager.increment(db, News, "id", previous_news_id, "comments_count", amount=-1)
+            await DBManager.increment(db, News, "id", row["news_id"], "comments_count")
+        await db.commit()
+
+        await response_cache.invalidate(f"news:{previous_news_id}", f"news:{row['news_id']}")
+        comment = DBManager.from_row(Comment, row)
+        await cls._publish("comment.updated", comment, news_ids={previous_news_id, comment.news_id})
+        return comment
+
     @classmethod
     async def create_comment(
         cls,
@@ -54,16 +166,21 @@ class CommentService:
         comment_data: dict,
         user: User
     ) -> Comment:
-        # Проверка существования новости
-        if not await DBManager.exists(db, News, "id", comment_data["news_id"]):
+        # Счётчик увеличивается только у существующей новости,
+        # поэтому UPDATE заодно проверяет её существование
+        if not await DBManager.increment(db, News, "id", comment_data["news_id"], "comments_count"):
             raise HTTPException(status_code=404, detail="News not found")
         comment_data["user_id"] = user.id
-        return await DBManager.create_object(
+        comment = await DBManager.create_object(
             db=db, 
             model=Comment,
             commit=True, 
             **comment_data
         )
+        # news details embed their comments
+        await response_cache.invalidate(f"news:{comment.news_id}")
+        await cls._publish("comment.created", comment)
+        return comment
 
     @classmethod
     async def delete_comment(
@@ -72,16 +189,18 @@ class CommentService:
         comment_id: int,
         user: User
     ) -> None:
-        comment = await cls.get_comment(db, comment_id)
-        if comment.user_id != user.id:
-            raise HTTPException(status_code=403, detail="You do not have permission to update this comment")
-        await DBManager.delete_object(
+        comment = await DBManager.delete_object(
             db=db, 
             model=Comment, 
             field="id", 
             value=comment_id, 
-            commit=True
+            filters={"user_id": user.id}
         )
+        if comment is None:
+            await cls._check_owner(db, comment_id)
+        await DBManager.increment(db, News, "id", comment.news_id, "comments_count", amount=-1, commit=True)
+        await response_cache.invalidate(f"news:{comment.news_id}")
+        await cls._publish("comment.deleted", comment)
 
     @classmethod
     async def update_comment(
@@ -91,17 +210,7 @@ class CommentService:
         comment_data: dict,
         user: User
     ) -> Comment:
-        comment = await cls.get_comment(db, comment_id)
-        if comment.user_id != user.id:
-            raise HTTPException(status_code=403, detail="You do not have permission to update this comment")
-        return await DBManager.update_object(
-            db=db,
-            model=Comment,
-            field="id",
-            value=comment_id,
-            commit=True,
-            **comment_data
-        )
+        return await cls._update_owned(db, comment_id, comment_data, user)
 
     @classmethod
     async def partial_update_comment(
@@ -114,18 +223,5 @@ class CommentService:
         """
         Частичное обновление комментария.
         """
-        comment = await DBManager.partial_update_object(
-            db=db,
-            model=Comment,
-            field="id",
-            value=comment_id,
-            commit=True,
-            **comment_data
-        )
-        if not comment:
-            raise HTTPException(status_code=404, detail="Comment not found")
-
-        if comment.user_id != user.id:
-            raise HTTPException(status_code=403, detail="You do not have permission to update this comment")
-
-        return comment
+        values = {field: value for field, value in comment_data.items() if value}
+        return await cls._update_owned(db, comment_id, values, user)
@@ -0,0 +1,146 @@
+"""
+Services module contains business logic
+"""
+
+import json
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator
+
+import asyncpg
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Category, News
+from ..schemas import NewsIngestSchema, NewsIngestErrorSchema, NewsIngestResultSchema
+from src import response_cache, NEWS_INGEST_BATCH_SIZE
+from src.media import MediaBlobService
+from src.realtime import event_broker
+
+
+COPY_COLUMNS = ["title", "content", "images", "category_id", "created", "updated", "comments_count"]
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """
+    Splits a byte stream into numbered lines without buffering the whole payload
+    """
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line
+    if buffer:
+        yield number + 1, buffer
+
+
+class NewsIngestService():
+
+    @classmethod
+    async def ingest(
+        cls,
+        db: AsyncSession,
+        lines: AsyncIterable[tuple[int, bytes]],
+        batch_size: int = NEWS_INGEST_BATCH_SIZE,
+    ) -> NewsIngestResultSchema:
+        """
+        Validates NDJSON news and inserts them in batches with COPY.
+        Invalid rows are reported and skipped, the rest of the batch is kept.
+        With MEDIA_STORAGE=hash every image must be a blob stored by an upload,
+        it gets its reference in the transaction of its row
+        """
+        result = NewsIngestResultSchema()
+        batch: list[tuple[int, NewsIngestSchema]] = []
+
+        async for number, line in lines:
+            if not line.strip():
+                continue
+            try:
+                batch.append((number, NewsIngestSchema.model_validate(json.loads(line))))
+            except (ValueError, ValidationError) as exc:
+                result.errors.append(NewsIngestErrorSchema(line=number, error=str(exc)))
+                continue
+
+            if len(batch) >= batch_size:
+                await cls._insert_batch(db, batch, result)
+                batch = []
+
+        if batch:
+            await cls._insert_batch(db, batch, result)
+
+        if result.inserted:
+            await response_cache.invalidate("news:list")
+            # one summary event instead of one per row
+            await event_broker.publish("news.bulk_created", {"inserted": result.inserted}, ["news"])
+        return result
+
+
+    @classmethod
+    async def _insert_batch(
+        cls,
+        db: AsyncSession,
+        batch: list[tuple[int, NewsIngestSchema]],
+        result: NewsIngestResultSchema,
+    ) -> None:
+        category_ids = {news.category_id for _, news in batch if news.category_id is not None}
+        existing = set()
+        if category_ids:
+            query = select(Category.id).where(Category.id.in_(category_ids))
+            existing = set((await db.execute(query)).scalars().all())
+
+        blobs = None
+        if MediaBlobService.is_enabled():
+            images = {image for _, news in batch for image in news.images}
+            blobs = await MediaBlobService.registered(db, MediaBlobService.blob_paths(images))
+
+        now = datetime.utcnow()
+        rows: list[tuple[int, tuple]] = []
+        for number, news in batch:
+            if news.category_id is not None and news.category_id not in existing:
+                result.errors.append(NewsIngestErrorSchema(line=number, error="Category not found"))
+                continue
+            unknown = [image for image in news.images if blobs is not None and image not in blobs]
+            if unknown:
+                result.errors.append(NewsIngestErrorSchema(line=number, error=f"Unknown images: {', '.join(unknown)}"))
+                continue
+            created = news.created or now
+            rows.append((number, (news.title, news.content, news.images, news.category_id, created, created, 0)))
+
+        if not rows:
+            return
+
+        try:
+            connection = await db.connection()
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                News.__tablename__, records=[row for _, row in rows], columns=COPY_COLUMNS
+            )
+            await MediaBlobService.acquire(db, [image for _, row in rows for image in row[2]])
+            await db.commit()
+            result.inserted += len(rows)
+        except (DBAPIError, asyncpg.PostgresError):
+            # COPY is all-or-nothing, retry row by row to isolate the bad ones
+            await db.rollback()
+            await cls._insert_rows(db, rows, result)
+
+
+    @classmethod
+    async def _insert_rows(
+        cls,
+        db: AsyncSession,
+        rows: list[tuple[int, tuple]],
+        result: NewsIngestResultSchema,
+    ) -> None:
+        for number, row in rows:
+            try:
+                async with db.begin_nested():
+                    await db.execute(insert(News).values(dict(zip(COPY_COLUMNS, row))))
+                    await MediaBlobService.acquire(db, row[2])
+                result.inserted += 1
+            except DBAPIError as exc:
+                result.errors.append(NewsIngestErrorSchema(line=number, error=str(exc.orig)))
+        await db.commit()
@@ -2,33 +2,131 @@
 Services module contains business logic
 """
 
-import asyncio
+from datetime import datetime, timezone
 from typing import Sequence
 
 from fastapi import HTTPException
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from ..models import News
-from ..utils import save_media
+from ..models import News, Comment, SEARCH_CONFIG, news_search_vector
+from ..schemas import NewsReadSchema
+from ..utils import save_media_files
 from .categories import CategoryService
+from .views import NewsViewService
 
-from src import DBManager
+from src import DBManager, response_cache, NEWS_EMBEDDED_COMMENTS
+from src.media import MediaBlobService
+from src.pagination import decode_rank_cursor, encode_rank_cursor
+from src.realtime import event_broker
+
+
+def naive_utc(value: datetime) -> datetime:
+    """
+    News.created is a naive UTC column, asyncpg refuses to compare it with aware values
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 class NewsService():
 
+    @classmethod
+    async def _release_images(
+        cls,
+        db: AsyncSession,
+        news_id: int,
+    ) -> None:
+        """
+        Drops the blob references held by the current images of a news object
+        """
+        if not MediaBlobService.is_enabled():
+            return
+        images = (await db.execute(select(News.images).where(News.id == news_id))).scalar_one_or_none()
+        await MediaBlobService.release(db, images)
+
+
+    @classmethod
+    async def _publish(
+        cls,
+        event: str,
+        news: News,
+        data: dict | None = None,
+    ) -> None:
+        """
+        Pushes a news event to the subscribers of all news and of its category
+        """
+        channels = ["news"]
+        if news.category_id is not None:
+            channels.append(f"category:{news.category_id}")
+        if data is None:
+            data = NewsReadSchema.model_validate(news).model_dump(mode="json")
+        await event_broker.publish(event, data, channels)
+
+
     @classmethod
     async def get_news(
         cls,
         db: AsyncSession,
         offset: int = 0,
         limit: int = 10,
-    ) -> Sequence[News]:
+        cursor: str | None = None,
+    ) -> tuple[Sequence[News], str | None]:
         """
         Service
         """
-        return await DBManager.get_objects(db, model=News, offset=offset, limit=limit)
+        return await DBManager.get_page(db, model=News, offset=offset, limit=limit, cursor=cursor)
+
+
+    @classmethod
+    async def search_news(
+        cls,
+        db: AsyncSession,
+        query: str,
+        category_id: int | None = None,
+        date_from: datetime | None = None,
+        date_to: datetime | None = None,
+        limit: int = 10,
+        cursor: str | None = None,
+    ) -> tuple[Sequence[dict], str | None]:
+        """
+        Full-text search over title and content, best matches first.
+        Results are paginated by (rank, id) keyset
+        """
+        vector = news_search_vector(News.title, News.content)
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = func.ts_rank_cd(vector, ts_query)
+
+        statement = (
+            select(
+                *News.__table__.columns,
+                rank.label("rank"),
+                func.ts_headline(SEARCH_CONFIG, News.title, ts_query).label("title_highlight"),
+                func.ts_headline(SEARCH_CONFIG, News.content, ts_query, "MaxFragments=2").label("content_highlight"),
+            )
+            .where(vector.op("@@")(ts_query))
+        )
+
+        if category_id is not None:
+            statement = statement.where(News.category_id == category_id)
+        if date_from is not None:
+            statement = statement.where(News.created >= naive_utc(date_from))
+        if date_to is not None:
+            statement = statement.where(News.created < naive_utc(date_to))
+        if cursor:
+            statement = statement.where(tuple_(rank, News.id) < decode_rank_cursor(cursor))
+
+        statement = statement.order_by(rank.desc(), News.id.desc()).limit(limit)
+        rows = (await db.execute(statement)).mappings().all()
+
+        next_cursor = None
+        if len(rows) == limit:
+            next_cursor = encode_rank_cursor(rows[-1]["rank"], rows[-1]["id"])
+        return rows, next_cursor
 
 
     @classmethod
@@ -38,11 +136,20 @@ class NewsService():
         news_id: int,
     ) -> News:
         """
-        Service
+        Returns news with its category and only the newest comments
         """
-        news = await DBManager.get_object(db=db, model=News, field="id", value=news_id, option=joinedload(News.category, News.comments))
+        news = await DBManager.get_object(db=db, model=News, field="id", value=news_id, option=joinedload(News.category))
         if news is None:
             raise HTTPException(status_code=404, detail="News not found")
+
+        comments = await DBManager.get_objects(
+            db=db,
+            model=Comment,
+            filters={"news_id": news_id},
+            limit=NEWS_EMBEDDED_COMMENTS,
+        )
+        # fills the relationship without marking the rest of the thread as removed
+        set_committed_value(news, "comments", list(comments))
         return news
 
 
@@ -58,9 +165,18 @@ class NewsService():
 
         await CategoryService.get_category(db, category_id=news["category_id"])
 
-        news["images"] = await asyncio.gather(*[save_media(file) for file in news["images"]])
+        news["images"] = await save_media_files(news["images"])
+        await MediaBlobService.acquire(db, news["images"])
 
-        return await DBManager.create_object(**news, db=db, model=News, commit=True)
+        try:
+            news = await DBManager.create_object(**news, db=db, model=News, commit=True)
+        except IntegrityError:
+            # the category was deleted after the check
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Category not found")
+        await response_cache.invalidate("news:list")
+        await cls._publish("news.created", news)
+        return news
 
 
     @classmethod
@@ -72,7 +188,14 @@ class NewsService():
         """
         Service
         """
-        await DBManager.delete_object(db=db, model=News, field="id", value=news_id, commit=True)
+        news = await DBManager.delete_object(db=db, model=News, field="id", value=news_id)
+        if news is not None:
+            await MediaBlobService.release(db, news.images)
+        await db.commit()
+        await response_cache.invalidate("news:list", f"news:{news_id}")
+        if news is not None:
+            await cls._publish("news.deleted", news, data={"id": news_id})
+        await NewsViewService.forget(news_id)
 
 
     @classmethod
@@ -88,12 +211,22 @@ class NewsService():
 
         await CategoryService.get_category(db=db, category_id=news["category_id"])
 
-        news["images"] = await asyncio.gather(*[save_media(file) for file in news["images"]])
+        news["images"] = await save_media_files(news["images"])
+        await cls._release_images(db, news_id)
+        await MediaBlobService.acquire(db, news["images"])
 
-        news = await DBManager.update_object(**news, db=db, model=News, field="id", value=news_id, commit=True)
+        try:
+            news = await DBManager.update_object(**news, db=db, model=News, field="id", value=news_id, commit=True)
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Category not found")
 
         if news is None:
             raise HTTPException(status_code=404, detail="News not found")
+
+        await response_cache.invalidate("news:list", f"news:{news_id}")
+        await cls._publish("news.updated", news)
+        await NewsViewService.remember(news)
         return news
 
 
@@ -112,10 +245,20 @@ class NewsService():
             await CategoryService.get_category(db=db, category_id=news["category_id"])
 
         if news["images"]:
-            news["images"] = await asyncio.gather(*[save_media(file) for file in news["images"]])
+            news["images"] = await save_media_files(news["images"])
+            await cls._release_images(db, news_id)
+            await MediaBlobService.acquire(db, news["images"])
 
-        news = await DBManager.partial_update_object(**news, db=db, model=News, field="id", value=news_id, commit=True)
+        try:
+            news = await DBManager.partial_update_object(**news, db=db, model=News, field="id", value=news_id, commit=True)
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Category not found")
 
         if news is None:
             raise HTTPException(status_code=404, detail="News not found")
+
+        await response_cache.invalidate("news:list", f"news:{news_id}")
+        await cls._publish("news.updated", news)
+        await NewsViewService.remember(news)
         return news
@@ -0,0 +1,277 @@
+"""
+Services module contains business logic
+"""
+
+import json
+import logging
+import uuid
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from sqlalchemy import BigInteger, Integer, column, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import News
+from ..schemas import NewsSummarySchema
+from src import (
+    redis_client,
+    NEWS_TRENDING_HALF_LIFE,
+    NEWS_TRENDING_SIZE,
+    NEWS_VIEWS_FLUSH_BATCH,
+    NEWS_VIEWS_FLUSH_LOCK_SECONDS,
+)
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "news:views:pending"
+FLUSHING_KEY = "news:views:flushing"
+FLUSH_LOCK_KEY = "news:views:flush:lock"
+POPULAR_KEY = "news:views:total"
+TRENDING_KEY = "news:trending"
+TRENDING_EPOCH_KEY = "news:trending:epoch"
+SUMMARIES_KEY = "news:summaries"
+
+
+# KEYS[1] - pending hash, KEYS[2] - popular zset, KEYS[3] - trending zset, KEYS[4] - trending epoch;
+# ARGV[1] - news id, ARGV[2] - half life in seconds.
+# Forward decay: a view adds 2^((now - epoch) / half_life), so older views
+# weigh relatively less without touching existing scores
+VIEW_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1])
+local epoch = tonumber(redis.call('GET', KEYS[4]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[4], epoch)
+end
+redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+redis.call('ZINCRBY', KEYS[2], 1, ARGV[1])
+redis.call('ZINCRBY', KEYS[3], math.pow(2, (now - epoch) / tonumber(ARGV[2])), ARGV[1])
+return 1
+"""
+
+# KEYS[1] - trending zset, KEYS[2] - trending epoch, KEYS[3] - popular zset, KEYS[4] - summaries hash;
+# ARGV[1] - half life, ARGV[2] - size.
+# Moves the epoch to now by scaling every score down, keeping the weights bounded,
+# keeps only the top entries of both rankings and drops summaries of news in neither
+RESCALE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1])
+local epoch = tonumber(redis.call('GET', KEYS[2]))
+if epoch and now > epoch then
+    local factor = math.pow(2, (epoch - now) / tonumber(ARGV[1]))
+    redis.call('ZUNIONSTORE', KEYS[1], 1, KEYS[1], 'WEIGHTS', factor)
+end
+redis.call('SET', KEYS[2], now)
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -tonumber(ARGV[2]) - 1)
+redis.call('ZREMRANGEBYRANK', KEYS[3], 0, -tonumber(ARGV[2]) - 1)
+for _, news_id in ipairs(redis.call('HKEYS', KEYS[4])) do
+    if not redis.call('ZSCORE', KEYS[1], news_id) and not redis.call('ZSCORE', KEYS[3], news_id) then
+        redis.call('HDEL', KEYS[4], news_id)
+    end
+end
+return redis.call('ZCARD', KEYS[1])
+"""
+
+# KEYS[1] - summaries hash; ARGV[1] - news id, ARGV[2] - summary.
+# Refreshes a summary only while the news is ranked, new ones are stored by the ranking reads
+REFRESH_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Releases the flush lock only if this run still owns it
+UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Claims the pending counters unless an unfinished claim is still there
+CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 1
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    return 1
+end
+return 0
+"""
+
+
+class NewsViewService():
+    """
+    View counting in Redis: pending counters for the News.views column,
+    an all-time sorted set for popular news and a time-decayed one for trending news.
+    Both sets keep NEWS_TRENDING_SIZE entries, summaries are kept only for ranked news
+    """
+
+    _view = redis_client.register_script(VIEW_SCRIPT)
+    _refresh = redis_client.register_script(REFRESH_SCRIPT)
+
+
+    @classmethod
+    async def record_view(cls, news_id: int) -> None:
+        """
+        One round trip per view; a Redis failure only loses the view
+        """
+        try:
+            await cls._view(
+                keys=[PENDING_KEY, POPULAR_KEY, TRENDING_KEY, TRENDING_EPOCH_KEY],
+                args=[news_id, NEWS_TRENDING_HALF_LIFE],
+            )
+        except RedisError:
+            logger.exception("Recording a view of news %s failed", news_id)
+
+
+    @classmethod
+    async def remember(cls, news: News) -> None:
+        """
+        Refreshes the summary shown by the ranking endpoints if the news is ranked
+        """
+        summary = NewsSummarySchema.model_validate(news).model_dump_json()
+        try:
+            await cls._refresh(keys=[SUMMARIES_KEY], args=[news.id, summary])
+        except RedisError:
+            logger.exception("Storing the summary of news %s failed", news.id)
+
+
+    @classmethod
+    async def forget(cls, news_id: int) -> None:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.hdel(SUMMARIES_KEY, str(news_id))
+                pipe.zrem(POPULAR_KEY, str(news_id))
+                pipe.zrem(TRENDING_KEY, str(news_id))
+                await pipe.execute()
+        except RedisError:
+            logger.exception("Removing news %s from rankings failed", news_id)
+
+
+    @classmethod
+    async def forget_summaries(cls) -> None:
+        """
+        Drops every summary, e.g. after a category delete changed category_id of many news;
+        they are loaded again by the next ranking reads
+        """
+        try:
+            await redis_client.delete(SUMMARIES_KEY)
+        except RedisError:
+            logger.exception("Dropping news summaries failed")
+
+
+    @classmethod
+    async def _ranking_from_db(cls, db: AsyncSession, limit: int) -> list[dict]:
+        """
+        Most viewed news by the persisted News.views, used while Redis has no ranking
+        """
+        query = select(News).order_by(News.views.desc(), News.id.desc()).limit(limit)
+        rows = (await db.execute(query)).scalars().all()
+        return [{**NewsSummarySchema.model_validate(news).model_dump(), "score": news.views} for news in rows]
+
+
+    @classmethod
+    async def _ranking(cls, db: AsyncSession, key: str, limit: int) -> list[dict]:
+        try:
+            return await cls._ranking_from_redis(db, key, limit)
+        except RedisError:
+            logger.exception("Reading the %s ranking failed, falling back to News.views", key)
+            return await cls._ranking_from_db(db, limit)
+
+
+    @classmethod
+    async def _ranking_from_redis(cls, db: AsyncSession, key: str, limit: int) -> list[dict]:
+        entries = await redis_client.zrevrange(key, 0, limit * 2 - 1, withscores=True)
+        if not entries:
+            # e.g. a Redis that lost its data: popular news are still known from the table
+            return await cls._ranking_from_db(db, limit) if key == POPULAR_KEY else []
+        news_ids = [news_id.decode() if isinstance(news_id, bytes) else str(news_id) for news_id, _ in entries]
+        summaries = dict(zip(news_ids, await redis_client.hmget(SUMMARIES_KEY, news_ids)))
+
+        missing = [int(news_id) for news_id, summary in summaries.items() if summary is None]
+        if missing:
+            rows = (await db.execute(select(News).where(News.id.in_(missing)))).scalars().all()
+            loaded = {str(news.id): NewsSummarySchema.model_validate(news).model_dump_json() for news in rows}
+            if loaded:
+                await redis_client.hset(SUMMARIES_KEY, mapping=loaded)
+            summaries.update(loaded)
+
+        ranking = []
+        for news_id, (_, score) in zip(news_ids, entries):
+            summary = summaries[news_id]
+            # news that no longer exist are skipped
+            if summary is not None:
+                ranking.append({**json.loads(summary), "score": score})
+            if len(ranking) == limit:
+                break
+        return ranking
+
+
+    @classmethod
+    async def get_trending(cls, db: AsyncSession, limit: int = 10) -> list[dict]:
+        return await cls._ranking(db, TRENDING_KEY, limit)
+
+
+    @classmethod
+    async def get_popular(cls, db: AsyncSession, limit: int = 10) -> list[dict]:
+        return await cls._ranking(db, POPULAR_KEY, limit)
+
+
+    @classmethod
+    async def flush(
+        cls,
+        db: AsyncSession,
+        redis: aioredis.Redis,
+        batch_size: int = NEWS_VIEWS_FLUSH_BATCH,
+    ) -> int:
+        """
+        Moves pending view counts into News.views in batches, at-least-once:
+        flushed ids are removed from the claimed hash after every commit and a crashed run
+        is resumed from what is left, so only a crash between a commit and its HDEL
+        counts that batch twice. One run at a time, guarded by FLUSH_LOCK_KEY.
+        The popular scores of flushed news are reset to their persisted totals, so a news
+        trimmed out of the top NEWS_TRENDING_SIZE comes back with its all-time count
+        """
+        token = uuid.uuid4().hex
+        if not await redis.set(FLUSH_LOCK_KEY, token, nx=True, ex=NEWS_VIEWS_FLUSH_LOCK_SECONDS):
+            return 0
+
+        try:
+            await redis.register_script(RESCALE_SCRIPT)(
+                keys=[TRENDING_KEY, TRENDING_EPOCH_KEY, POPULAR_KEY, SUMMARIES_KEY],
+                args=[NEWS_TRENDING_HALF_LIFE, NEWS_TRENDING_SIZE],
+            )
+            if not await redis.register_script(CLAIM_SCRIPT)(keys=[PENDING_KEY, FLUSHING_KEY]):
+                return 0
+
+            flushed = 0
+            pending = await redis.hgetall(FLUSHING_KEY)
+            items = [(int(news_id), int(count)) for news_id, count in pending.items()]
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                rows = values(column("id", Integer), column("views", BigInteger), name="pending").data(batch)
+                totals = (await db.execute(
+                    update(News)
+                    .where(News.id == rows.c.id)
+                    .values(views=News.views + rows.c.views)
+                    .returning(News.id, News.views)
+                    .execution_options(synchronize_session=False)
+                )).all()
+                await db.commit()
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.hdel(FLUSHING_KEY, *[str(news_id) for news_id, _ in batch])
+                    if totals:
+                        # views counted after the claim are added again by the next flush
+                        pipe.zadd(POPULAR_KEY, {str(news_id): views for news_id, views in totals})
+                    await pipe.execute()
+                flushed += sum(count for _, count in batch)
+            await redis.delete(FLUSHING_KEY)
+            return flushed
+        finally:
+            await redis.register_script(UNLOCK_SCRIPT)(keys=[FLUSH_LOCK_KEY], args=[token])
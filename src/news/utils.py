@@ -2,18 +2,107 @@
 Utils
 """
 
+import asyncio
+import hashlib
 import os
+from uuid import uuid4
+
 import aiofiles
-from fastapi import UploadFile
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+
+from ..environs import (
+    MEDIA_ROOT,
+    MEDIA_CHUNK_SIZE,
+    MEDIA_MAX_FILE_SIZE,
+    MEDIA_MAX_REQUEST_SIZE,
+    MEDIA_MAX_CONCURRENT_WRITES,
+    MEDIA_STORAGE,
+    MEDIA_BLOB_ROOT,
+)
+from ..media.services import BLOB_EXTENSION, MediaBlobService
+
+
+# Caps how many uploads are written to disk at the same time in this process
+media_write_semaphore = asyncio.Semaphore(MEDIA_MAX_CONCURRENT_WRITES)
+
+
+async def _remove_silently(path: str) -> None:
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
 
-from ..environs import MEDIA_ROOT
 
+def blob_path(digest: str, filename: str) -> str:
+    """
+    Sharded content-addressed path: blobs/ab/cd/abcd....ext
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if not BLOB_EXTENSION.fullmatch(extension):
+        extension = ""
+    return os.path.join(MEDIA_BLOB_ROOT, digest[:2], digest[2:4], f"{digest}{extension}")
 
 
-async def save_media(upload_file: UploadFile) -> str:
-    file_path = os.path.join(MEDIA_ROOT, upload_file.filename)
+async def save_media(upload_file: UploadFile, max_size: int = MEDIA_MAX_FILE_SIZE) -> str:
+    """
+    Streams an upload to MEDIA_ROOT in chunks through a temporary file
+    and atomically renames it, so memory stays flat for any file size.
+    With MEDIA_STORAGE=hash the bytes are hashed while streaming and
+    the write is skipped when an identical blob is already stored
+    """
+    filename = os.path.basename(upload_file.filename)
+    temp_path = os.path.join(MEDIA_ROOT, f"{uuid4().hex}.part")
+    digest = hashlib.sha256() if MEDIA_STORAGE == "hash" else None
+    written = 0
 
-    async with aiofiles.open(file=file_path, mode="wb") as file:
-        await file.write(await upload_file.read())
+    async with media_write_semaphore:
+        try:
+            async with aiofiles.open(file=temp_path, mode="wb") as file:
+                while chunk := await upload_file.read(MEDIA_CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > max_size:
+                        raise HTTPException(status_code=413, detail=f"File {upload_file.filename} is too large")
+                    if digest is not None:
+                        digest.update(chunk)
+                    await file.write(chunk)
+
+            if digest is None:
+                file_path = os.path.join(MEDIA_ROOT, filename)
+            else:
+                file_path = blob_path(digest.hexdigest(), filename)
+                # the row comes first, so garbage collection can not drop a blob being reused
+                await MediaBlobService.register(file_path)
+                if await aiofiles.os.path.exists(file_path):
+                    await _remove_silently(temp_path)
+                    return file_path
+                await aiofiles.os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            await aiofiles.os.replace(temp_path, file_path)
+        except BaseException:
+            await _remove_silently(temp_path)
+            raise
 
     return file_path
+
+
+async def save_media_files(upload_files: list[UploadFile]) -> list[str]:
+    """
+    Saves every upload of a request, enforcing the per-request size limit.
+    If one file fails, the files already written are removed
+    """
+    if sum(upload_file.size or 0 for upload_file in upload_files) > MEDIA_MAX_REQUEST_SIZE:
+        raise HTTPException(status_code=413, detail="Request files are too large")
+
+    results = await asyncio.gather(
+        *[save_media(upload_file) for upload_file in upload_files],
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        # blobs may already be shared with other news, they are registered and left to garbage collection
+        if MEDIA_STORAGE != "hash":
+            await asyncio.gather(*[_remove_silently(result) for result in results if isinstance(result, str)])
+        raise errors[0]
+
+    return results
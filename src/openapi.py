@@ -0,0 +1,62 @@
+"""
+OpenAPI schema, built on demand or loaded from a prebuilt file.
+
+Build the file once, e.g. in the Docker image:
+
+    python -m src.openapi openapi.json
+"""
+
+import json
+import sys
+from typing import Any
+
+from fastapi import FastAPI
+from fastapi.openapi.utils import get_openapi
+
+from .environs import OPENAPI_SCHEMA_PATH
+
+
+def build_openapi_schema(app: FastAPI) -> dict[str, Any]:
+    openapi_schema = get_openapi(
+        title="FastNews API",
+        version="1.0.0",
+        description="This is a simple FastAPI project with JWT authentication, SQLAlchemy ORM, and PostgreSQL database, alembic for migrations, and docker-compose for development and production environments.",
+        routes=app.routes,
+    )
+    openapi_schema["components"]["securitySchemes"] = {
+        "BearerAuth": {
+            "type": "http",
+            "scheme": "bearer",
+            "bearerFormat": "JWT",
+        }
+    }
+    for path in openapi_schema["paths"].values():
+        for method in path:
+            path[method]["security"] = [{"BearerAuth": []}]
+    return openapi_schema
+
+
+def install_openapi(app: FastAPI, schema_path: str = OPENAPI_SCHEMA_PATH) -> None:
+    """
+    Replaces app.openapi so the schema is not generated at import time.
+    A prebuilt schema file is served as is, otherwise the schema
+    is generated on the first request and kept
+    """
+    def openapi() -> dict[str, Any]:
+        if app.openapi_schema is None:
+            if schema_path:
+                with open(schema_path) as file:
+                    app.openapi_schema = json.load(file)
+            else:
+                app.openapi_schema = build_openapi_schema(app)
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+
+if __name__ == "__main__":
+    from main import create_app
+
+    output = sys.argv[1] if len(sys.argv) > 1 else "openapi.json"
+    with open(output, "w") as file:
+        json.dump(build_openapi_schema(create_app()), file)
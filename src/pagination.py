@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _pack(values: list[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _unpack(cursor: str) -> Any:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def encode_cursor(created: datetime, id: int) -> str:
+    """
+    Packs the (created, id) keyset of the last row into an opaque cursor
+    """
+    return _pack([created.isoformat(), id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Unpacks a cursor produced by encode_cursor
+    """
+    try:
+        created, id = _unpack(cursor)
+        return datetime.fromisoformat(created), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_rank_cursor(rank: float, id: int) -> str:
+    """
+    Packs the (rank, id) keyset of the last ranked row into an opaque cursor
+    """
+    return _pack([rank, id])
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, int]:
+    """
+    Unpacks a cursor produced by encode_rank_cursor
+    """
+    try:
+        rank, id = _unpack(cursor)
+        return float(rank), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def next_cursor_for(objects: Any, limit: int) -> str | None:
+    """
+    Returns the cursor pointing after the last object of a full page
+    """
+    if not objects or len(objects) < limit:
+        return None
+    last = objects[-1]
+    return encode_cursor(last.created, last.id)
+
+
+def next_cursor_headers(next_cursor: str | None) -> dict[str, str]:
+    """
+    Returns the headers exposing the next page cursor to the client
+    """
+    if next_cursor is None:
+        return {}
+    return {NEXT_CURSOR_HEADER: next_cursor}
@@ -0,0 +1,107 @@
+"""
+Per-request SQL statement accounting and N+1 detection
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from .environs import DB_QUERY_BUDGET, DB_REPEATED_QUERY_THRESHOLD
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryLog:
+    """
+    Statements executed in the current request or tracking block.
+    A nested block also reports to the enclosing one
+    """
+    statements: list[str] = field(default_factory=list)
+    duration: float = 0.0
+    parent: "QueryLog | None" = None
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = DB_REPEATED_QUERY_THRESHOLD) -> list[tuple[str, int]]:
+        """
+        Statements executed at least threshold times, the usual N+1 signature
+        """
+        return [
+            (statement, times)
+            for statement, times in Counter(self.statements).most_common()
+            if times >= threshold
+        ]
+
+
+current_query_log: ContextVar[QueryLog | None] = ContextVar("current_query_log", default=None)
+
+
+def record_query(statement: str, duration: float) -> None:
+    """
+    Called from engine events; SQLAlchemy runs them in the caller's context
+    """
+    query_log = current_query_log.get()
+    while query_log is not None:
+        query_log.statements.append(statement)
+        query_log.duration += duration
+        query_log = query_log.parent
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryLog]:
+    """
+    Collects the statements executed inside the block
+    """
+    query_log = QueryLog(parent=current_query_log.get())
+    token = current_query_log.set(query_log)
+    try:
+        yield query_log
+    finally:
+        current_query_log.reset(token)
+
+
+class QueryBudgetMiddleware():
+    """
+    ASGI middleware adding a Server-Timing header with the DB time of each
+    request and logging requests over DB_QUERY_BUDGET statements
+    """
+
+    def __init__(self, app, budget: int = DB_QUERY_BUDGET) -> None:
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as query_log:
+
+            async def send_wrapper(message) -> None:
+                if message["type"] == "http.response.start":
+                    timing = f'db;dur={query_log.duration * 1000:.1f};desc="{query_log.count} queries"'
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"server-timing", timing.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        if query_log.count > self.budget or query_log.repeated():
+            route = getattr(scope.get("route"), "path", scope["path"])
+            logger.warning(
+                "%s %s ran %d queries in %.1f ms (budget %d); repeated: %s; statements: %s",
+                scope["method"],
+                route,
+                query_log.count,
+                query_log.duration * 1000,
+                self.budget,
+                query_log.repeated(),
+                query_log.statements,
+            )
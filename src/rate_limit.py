@@ -0,0 +1,224 @@
+"""
+Token bucket rate limiting shared by all workers through Redis
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import jwt
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi_users.jwt import decode_jwt
+from redis.exceptions import RedisError
+
+from .environs import (
+    JWT_SECRET,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMITS,
+    RATE_LIMIT_TRUST_PROXY,
+    RATE_LIMIT_FALLBACK_SECONDS,
+)
+from .redis import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+
+# KEYS[1] - bucket hash; ARGV[1] - capacity, ARGV[2] - period in seconds, ARGV[3] - cost.
+# Returns {allowed, remaining, seconds until full, seconds until a retry can pass}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local rate = capacity / period
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(bucket[1]) or capacity
+local at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - at) * rate)
+
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry = math.ceil((cost - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(period))
+return {allowed, math.floor(tokens), math.ceil((capacity - tokens) / rate), retry}
+"""
+
+
+@dataclass
+class Policy:
+    """
+    `limit` requests per `period` seconds, refilled continuously
+    """
+    limit: int
+    period: int
+
+    @classmethod
+    def parse(cls, value: str) -> "Policy":
+        limit, period = value.split("/")
+        return cls(limit=int(limit), period=int(period))
+
+
+DEFAULT_POLICIES = {
+    "comments:create": Policy(limit=20, period=60),
+    "news:create": Policy(limit=30, period=60),
+    "news:bulk": Policy(limit=10, period=3600),
+    "auth:register": Policy(limit=5, period=3600),
+}
+
+
+def load_policies(overrides: str = RATE_LIMITS) -> dict[str, Policy]:
+    policies = dict(DEFAULT_POLICIES)
+    for item in filter(None, (part.strip() for part in overrides.split(","))):
+        name, value = item.split("=")
+        policies[name.strip()] = Policy.parse(value.strip())
+    return policies
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    remaining: int
+    reset: int
+    retry_after: int
+
+
+class RateLimiter():
+    """
+    Token buckets evaluated by one Lua script, i.e. one Redis round trip per check.
+    While Redis is unreachable the buckets live in process memory,
+    so every worker enforces the limits on its own
+    """
+
+    def __init__(
+        self,
+        prefix: str = "ratelimit",
+        fallback_seconds: float = RATE_LIMIT_FALLBACK_SECONDS,
+        local_size: int = 10000,
+    ) -> None:
+        self.prefix = prefix
+        self.fallback_seconds = fallback_seconds
+        self.local_size = local_size
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._local: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._redis_down_until = 0.0
+
+    async def hit(self, key: str, policy: Policy, cost: int = 1) -> Decision:
+        key = f"{self.prefix}:{key}"
+        if time.monotonic() >= self._redis_down_until:
+            try:
+                allowed, remaining, reset, retry_after = await self._script(
+                    keys=[key], args=[policy.limit, policy.period, cost]
+                )
+                return Decision(bool(allowed), remaining, reset, retry_after)
+            except RedisError:
+                logger.exception("Rate limiter falls back to local buckets")
+                self._redis_down_until = time.monotonic() + self.fallback_seconds
+        return self._hit_local(key, policy, cost)
+
+
+    def _hit_local(self, key: str, policy: Policy, cost: int) -> Decision:
+        rate = policy.limit / policy.period
+        now = time.monotonic()
+        tokens, at = self._local.pop(key, (policy.limit, now))
+        tokens = min(policy.limit, tokens + (now - at) * rate)
+
+        allowed = tokens >= cost
+        retry_after = 0
+        if allowed:
+            tokens -= cost
+        else:
+            retry_after = math.ceil((cost - tokens) / rate)
+
+        self._local[key] = (tokens, now)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+        return Decision(allowed, math.floor(tokens), math.ceil((policy.limit - tokens) / rate), retry_after)
+
+
+rate_limiter = RateLimiter()
+policies = load_policies()
+
+
+def client_identity(request: Request) -> str:
+    """
+    User id of a valid bearer token, otherwise the client address
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            user_id = decode_jwt(token, JWT_SECRET, ["fastapi-users:auth"]).get("sub")
+            if user_id:
+                return f"user:{user_id}"
+        except jwt.PyJWTError:
+            pass
+
+    address = request.headers.get("X-Real-IP") if RATE_LIMIT_TRUST_PROXY else None
+    if address is None:
+        address = request.client.host if request.client else "unknown"
+    return f"ip:{address}"
+
+
+# Limited routes by method and path. The middleware checks them before the
+# route runs, so a rejected request never has its (multipart) body read
+RATE_LIMITED_ROUTES = {
+    ("POST", "/comments"): "comments:create",
+    ("POST", "/news"): "news:create",
+    ("POST", "/news/bulk"): "news:bulk",
+    ("POST", "/auth/register"): "auth:register",
+}
+
+
+class RateLimitMiddleware():
+    """
+    ASGI middleware enforcing a named policy per user or IP on RATE_LIMITED_ROUTES.
+    Sets the RateLimit-* headers and answers 429 with Retry-After
+    """
+
+    def __init__(self, app, routes: dict[tuple[str, str], str] = RATE_LIMITED_ROUTES) -> None:
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send) -> None:
+        name = None
+        if scope["type"] == "http" and RATE_LIMIT_ENABLED:
+            name = self.routes.get((scope["method"], scope["path"].rstrip("/") or "/"))
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        policy = policies[name]
+        decision = await rate_limiter.hit(f"{name}:{client_identity(Request(scope))}", policy)
+        headers = {
+            "RateLimit-Policy": f"{policy.limit};w={policy.period}",
+            "RateLimit-Limit": str(policy.limit),
+            "RateLimit-Remaining": str(decision.remaining),
+            "RateLimit-Reset": str(decision.reset),
+        }
+        if not decision.allowed:
+            headers["Retry-After"] = str(decision.retry_after)
+            response = JSONResponse(status_code=429, content={"detail": "Too many requests"}, headers=headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    *[(key.lower().encode(), value.encode()) for key, value in headers.items()],
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
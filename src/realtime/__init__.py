@@ -0,0 +1,6 @@
+"""
+__init__.py
+"""
+
+from .broker import *
+from .routers import router as realtime_router
@@ -0,0 +1,136 @@
+"""
+Event fan-out across workers through Redis pub/sub.
+
+Every process holds a single pattern subscription and hands events
+to its local subscribers through bounded queues
+"""
+
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Iterable
+
+from redis.exceptions import RedisError
+
+from src.environs import REALTIME_QUEUE_SIZE
+from src.redis import redis_client
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "events:"
+CHANNEL_PATTERN = re.compile(r"^(news|category:\d+|comments:\d+)$")
+
+__all__ = ["Subscription", "EventBroker", "event_broker", "is_valid_channel"]
+
+
+def is_valid_channel(channel: str) -> bool:
+    """
+    news - every news event, category:{id} - news of a category,
+    comments:{news_id} - comments of one news
+    """
+    return CHANNEL_PATTERN.match(channel) is not None
+
+
+class Subscription():
+    """
+    Queue of encoded events for one client. A client that falls
+    queue_size events behind is marked lagged and gets disconnected,
+    so a slow consumer never holds back the others or grows memory
+    """
+
+    def __init__(self, channels: Iterable[str], queue_size: int = REALTIME_QUEUE_SIZE) -> None:
+        self.channels = set(channels)
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.lagged = False
+        # set on overflow, so the consumer closes without draining the queue first
+        self.overflow = asyncio.Event()
+
+    def push(self, message: str) -> None:
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagged = True
+            self.overflow.set()
+
+
+class EventBroker():
+
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._listener: asyncio.Task | None = None
+
+
+    async def publish(self, event: str, data: dict[str, Any], channels: Iterable[str]) -> None:
+        """
+        Publishes one event to several channels in a single round trip.
+        A Redis failure is logged, the write that caused the event still succeeds
+        """
+        message = json.dumps({"event": event, "data": data}, default=str)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for channel in channels:
+                    pipe.publish(f"{CHANNEL_PREFIX}{channel}", message)
+                await pipe.execute()
+        except RedisError:
+            logger.exception("Publishing %s failed", event)
+
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        subscription = Subscription(channels)
+        for channel in subscription.channels:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return subscription
+
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for channel in subscription.channels:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+
+    def dispatch(self, channel: str, message: str) -> None:
+        for subscription in list(self._subscribers.get(channel, ())):
+            subscription.push(message)
+
+
+    async def _listen(self) -> None:
+        """
+        Reads the pattern subscription and reconnects with a backoff on errors
+        """
+        delay = 0.5
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                delay = 0.5
+                async for message in pubsub.listen():
+                    channel = message["channel"].decode().removeprefix(CHANNEL_PREFIX)
+                    self.dispatch(channel, message["data"].decode())
+            except (RedisError, OSError):
+                logger.exception("Event subscription lost, reconnecting in %ss", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+event_broker = EventBroker()
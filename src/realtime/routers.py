@@ -0,0 +1,103 @@
+"""
+Realtime routers: the same event stream over WebSocket and Server-Sent Events
+"""
+
+import asyncio
+from typing import Annotated, AsyncIterator
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from src.environs import REALTIME_HEARTBEAT_SECONDS, REALTIME_SEND_TIMEOUT, REALTIME_MAX_CHANNELS
+
+from .broker import event_broker, is_valid_channel
+
+
+router = APIRouter(tags=["Realtime"])
+
+Channels = Annotated[list[str], Query(alias="channel", min_length=1, max_length=REALTIME_MAX_CHANNELS)]
+
+
+def invalid_channels(channels: list[str]) -> list[str]:
+    return [channel for channel in channels if not is_valid_channel(channel)]
+
+
+@router.websocket("/ws/events")
+async def events_websocket(websocket: WebSocket, channels: Channels) -> None:
+    """
+    Streams events of the requested channels as JSON text frames.
+    Clients that can not keep up are closed with 1013 as soon as their queue
+    overflows and should reconnect and refetch the lists they show
+    """
+    if invalid_channels(channels):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = event_broker.subscribe(channels)
+    receiver = asyncio.create_task(websocket.receive())
+    overflow = asyncio.create_task(subscription.overflow.wait())
+    getter: asyncio.Task | None = None
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.create_task(subscription.queue.get())
+            done, _ = await asyncio.wait({getter, receiver, overflow}, return_when=asyncio.FIRST_COMPLETED)
+
+            if overflow in done:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="lagged")
+                return
+
+            if receiver in done:
+                # clients only listen, anything they send is ignored
+                if receiver.result()["type"] == "websocket.disconnect":
+                    return
+                receiver = asyncio.create_task(websocket.receive())
+
+            if getter in done:
+                message, getter = getter.result(), None
+                await asyncio.wait_for(websocket.send_text(message), timeout=REALTIME_SEND_TIMEOUT)
+    except (WebSocketDisconnect, asyncio.TimeoutError):
+        pass
+    finally:
+        receiver.cancel()
+        overflow.cancel()
+        if getter is not None:
+            getter.cancel()
+        event_broker.unsubscribe(subscription)
+
+
+async def event_stream(channels: list[str]) -> AsyncIterator[str]:
+    # subscribing inside the generator ties the subscription to the response lifetime
+    subscription = event_broker.subscribe(channels)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=REALTIME_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # keeps proxies from closing an idle stream
+                yield ": ping\n\n"
+                continue
+            # the rest of an overflowed queue is dropped instead of being streamed
+            if subscription.lagged:
+                yield "event: lagged\ndata: {}\n\n"
+                return
+            yield f"data: {message}\n\n"
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def events_stream(channels: Channels) -> StreamingResponse:
+    """
+    Server-Sent Events stream of the requested channels
+    """
+    invalid = invalid_channels(channels)
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown channels: {', '.join(invalid)}")
+
+    return StreamingResponse(
+        event_stream(channels),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,28 @@
 import random
 import string
+import time
 
 from redis import asyncio as aioredis
 
 from src import REDIS_URL
+from .metrics import redis_command_seconds
 
-redis_client = aioredis.from_url(url=REDIS_URL)
+
+class InstrumentedRedis(aioredis.Redis):
+    """
+    Redis client reporting the latency of every command
+    """
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            command = args[0] if isinstance(args[0], str) else args[0].decode()
+            redis_command_seconds.labels(command.upper()).observe(time.perf_counter() - started)
+
+
+redis_client = InstrumentedRedis.from_url(url=REDIS_URL)
 
 def generate_verification_code(lenght: int=6) -> str:
     return "".join(random.choices(string.ascii_uppercase + string.digits, k=lenght))
\ No newline at end of file
@@ -2,15 +2,54 @@
 Authentication config module
 """
 
+from typing import Optional
+
+import jwt
+from fastapi_users import exceptions
 from fastapi_users.authentication import BearerTransport, JWTStrategy, AuthenticationBackend
+from fastapi_users.jwt import decode_jwt
 
+from .cache import user_cache
+from .models import User
 from src import JWT_SECRET
 
 bearer_transport = BearerTransport(tokenUrl="auth/jwt/login")
 
 
+class CachedJWTStrategy(JWTStrategy):
+    """
+    JWT strategy that still verifies every token, but resolves the user
+    from user_cache instead of loading the row on each request
+    """
+
+    async def read_token(self, token: Optional[str], user_manager) -> Optional[User]:
+        if token is None:
+            return None
+
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+            user_id = data.get("sub")
+            if user_id is None:
+                return None
+            parsed_id = user_manager.parse_id(user_id)
+        except (jwt.PyJWTError, exceptions.InvalidID):
+            return None
+
+        signature = token.rsplit(".", 1)[-1]
+        user = await user_cache.get(parsed_id, signature)
+        if user is not None:
+            return user
+
+        try:
+            user = await user_manager.get(parsed_id)
+        except exceptions.UserNotExists:
+            return None
+        await user_cache.set(user, signature)
+        return user
+
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=JWT_SECRET, lifetime_seconds=3600)
+    return CachedJWTStrategy(secret=JWT_SECRET, lifetime_seconds=3600)
 
 
 auth_backend = AuthenticationBackend(
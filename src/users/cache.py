@@ -0,0 +1,127 @@
+"""
+Cache of users resolved from access tokens
+"""
+
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+from redis.exceptions import RedisError
+from sqlalchemy.orm import make_transient_to_detached
+
+from .models import User
+from src import (
+    redis_client,
+    AUTH_USER_CACHE_ENABLED,
+    AUTH_USER_CACHE_TTL,
+    AUTH_USER_CACHE_LOCAL_TTL,
+    AUTH_USER_CACHE_LOCAL_SIZE,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# hashed_password never leaves the database, it stays expired on cached users
+CACHED_FIELDS = ("email", "is_active", "is_superuser", "is_verified", "full_name")
+
+
+class UserCache():
+    """
+    Two-level cache of verified users keyed by user id and token signature.
+    An in-process LRU with a short TTL sits in front of a Redis hash per user,
+    so invalidating a user is a single DEL shared by every worker
+    """
+
+    def __init__(
+        self,
+        prefix: str = "auth:user",
+        ttl: int = AUTH_USER_CACHE_TTL,
+        local_ttl: float = AUTH_USER_CACHE_LOCAL_TTL,
+        local_size: int = AUTH_USER_CACHE_LOCAL_SIZE,
+        enabled: bool = AUTH_USER_CACHE_ENABLED,
+    ) -> None:
+        self.prefix = prefix
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self.enabled = enabled
+        self._local: OrderedDict[tuple[uuid.UUID, str], tuple[float, dict]] = OrderedDict()
+
+    def key(self, user_id: uuid.UUID) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    @staticmethod
+    def to_user(user_id: uuid.UUID, fields: dict) -> User:
+        """
+        Builds a detached User, so the request session can still add and update it
+        """
+        user = User(id=user_id, **fields)
+        make_transient_to_detached(user)
+        return user
+
+
+    async def get(self, user_id: uuid.UUID, signature: str) -> User | None:
+        if not self.enabled:
+            return None
+
+        entry = self._local.get((user_id, signature))
+        if entry is not None:
+            expires, fields = entry
+            if expires > time.monotonic():
+                self._local.move_to_end((user_id, signature))
+                return self.to_user(user_id, fields)
+            del self._local[(user_id, signature)]
+
+        try:
+            payload = await redis_client.hget(self.key(user_id), signature)
+        except RedisError:
+            logger.exception("User cache read failed for %s", user_id)
+            return None
+        if payload is None:
+            return None
+
+        fields = json.loads(payload)
+        self._remember(user_id, signature, fields)
+        return self.to_user(user_id, fields)
+
+
+    async def set(self, user: User, signature: str) -> None:
+        if not self.enabled:
+            return
+
+        fields = {name: getattr(user, name) for name in CACHED_FIELDS}
+        self._remember(user.id, signature, fields)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(self.key(user.id), signature, json.dumps(fields))
+                pipe.expire(self.key(user.id), self.ttl)
+                await pipe.execute()
+        except RedisError:
+            logger.exception("User cache write failed for %s", user.id)
+
+
+    async def invalidate(self, user_id: uuid.UUID) -> None:
+        """
+        Drops every cached token of the user
+        """
+        if not self.enabled:
+            return
+
+        for key in [key for key in self._local if key[0] == user_id]:
+            del self._local[key]
+        try:
+            await redis_client.delete(self.key(user_id))
+        except RedisError:
+            logger.exception("User cache invalidation failed for %s", user_id)
+
+
+    def _remember(self, user_id: uuid.UUID, signature: str, fields: dict) -> None:
+        self._local[(user_id, signature)] = (time.monotonic() + self.local_ttl, fields)
+        self._local.move_to_end((user_id, signature))
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+
+user_cache = UserCache()
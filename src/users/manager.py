@@ -1,13 +1,13 @@
 import uuid
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from fastapi import Depends, Request
 from fastapi_users import BaseUserManager, UUIDIDMixin
 
+from .cache import user_cache
 from .models import User, get_user_db
 from src import (
     USER_MANAGER_SECRET,
-    send_verification_code,
     generate_verification_code, 
     redis_client
 )
@@ -18,13 +18,31 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     verification_token_secret = USER_MANAGER_SECRET
 
     async def on_after_register(self, user: User, request: Optional[Request] = None):
+        # the Celery app is only built once something is enqueued
+        from src.celery import send_verification_email
+
         code = generate_verification_code()
         await redis_client.setex(
             name=user.email,
             time=600,
             value=code
         )
-        send_verification_code.apply_async(args=[user.email, code])
+        await send_verification_email(user.email, code)
+
+    async def on_after_update(
+        self, user: User, update_dict: Dict[str, Any], request: Optional[Request] = None
+    ):
+        # covers deactivation too: is_active is changed through update
+        await user_cache.invalidate(user.id)
+
+    async def on_after_verify(self, user: User, request: Optional[Request] = None):
+        await user_cache.invalidate(user.id)
+
+    async def on_after_reset_password(self, user: User, request: Optional[Request] = None):
+        await user_cache.invalidate(user.id)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        await user_cache.invalidate(user.id)
 
     async def on_after_forgot_password(
         self, user: User, token: str, request: Optional[Request] = None
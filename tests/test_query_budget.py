@@ -0,0 +1,81 @@
+"""
+Query counts of the hot read endpoints, run against the database from the environment
+"""
+
+import uuid
+
+import httpx
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.exc import DBAPIError
+
+from main import app
+from src import DBManager, async_session, dispose_engines, response_cache
+from src.news.models import Category, Comment, News
+from src.users.models import User
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def news(monkeypatch):
+    """
+    News with a category and a few comments, removed after the test
+    """
+    # every request has to reach the database
+    monkeypatch.setattr(response_cache, "enabled", False)
+
+    async with async_session() as db:
+        try:
+            category = await DBManager.create_object(db=db, model=Category, name=f"query-budget-{uuid.uuid4().hex[:8]}")
+        except (OSError, DBAPIError) as exc:
+            await dispose_engines()
+            pytest.skip(f"database is not available: {exc}")
+        user = await DBManager.create_object(
+            db=db,
+            model=User,
+            id=uuid.uuid4(),
+            email=f"{uuid.uuid4().hex}@example.com",
+            hashed_password="-",
+            full_name="Query Budget",
+            is_active=True,
+            is_superuser=False,
+            is_verified=True,
+        )
+        news = await DBManager.create_object(db=db, model=News, title="Query budget", images=[], category_id=category.id)
+        for number in range(5):
+            await DBManager.create_object(db=db, model=Comment, text=f"Comment {number}", news_id=news.id, user_id=user.id)
+        await db.commit()
+
+    yield news
+
+    async with async_session() as db:
+        await db.execute(delete(News).where(News.id == news.id))
+        await db.execute(delete(User).where(User.id == user.id))
+        await db.execute(delete(Category).where(Category.id == category.id))
+        await db.commit()
+    # asyncpg connections are bound to the event loop of the test
+    await dispose_engines()
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_news_detail_query_count(news, client, max_queries):
+    # the news joined with its category, then the newest comments
+    with max_queries(2):
+        response = await client.get(f"/news/{news.id}")
+    assert response.status_code == 200
+    assert len(response.json()["comments"]) == 5
+
+
+async def test_news_list_query_count(news, client, max_queries):
+    # one keyset page, no per-row loading
+    with max_queries(1):
+        response = await client.get("/news", params={"limit": 20})
+    assert response.status_code == 200
+    assert response.json()